@@ -0,0 +1,117 @@
+"""
+Decisions of a bot made in the background while the game keeps running.
+
+When a piece spawns the game sends a packed snapshot of its state to a
+DecisionWorker, which runs the decide function in a thread or in a
+subprocess. The game polls the worker on every update without waiting, and
+once the placement is ready it is turned into a queue of inputs that the
+game plays one per update. A new request, a reset or a pause cancels the
+pending decision: the decide function is given a check that turns True once
+its request was cancelled so it can stop early and free the worker for the
+next request, a result that arrives after that is dropped.
+"""
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+import typing
+
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.placement import Placement
+from pyglet_block_puzzle.search import Cancelled, PlacementSearch
+from pyglet_block_puzzle.serialization import GameState, GameStateCodec
+from pyglet_block_puzzle.shape import SHAPES, Shape
+
+_logger = logging.getLogger(__name__)
+
+Decide = typing.Callable[[Board, typing.List[typing.Type[Shape]], Cancelled], typing.Optional[Placement]]
+
+# the request counter of the DecisionWorker that the current worker thread (or process) decides for
+_worker = threading.local()
+
+
+class SearchDecider:
+    """Decide with a PlacementSearch in the worker, without a pool of its own"""
+    def __init__(self, depth=2):
+        self.depth = depth
+        self._search = PlacementSearch(depth, workers=0)
+
+    def __call__(self, board: Board, preview: typing.List[typing.Type[Shape]],
+                 cancelled: Cancelled = None) -> typing.Optional[Placement]:
+        return self._search.search(board, preview, cancelled=cancelled).placement
+
+
+def placement_inputs(placement: Placement) -> typing.List[str]:
+    """The inputs that move the active piece to a placement, named after the Board methods"""
+    inputs = ['rotate'] * placement.rotations
+    inputs += ['move_right' if placement.shift > 0 else 'move_left'] * abs(placement.shift)
+    inputs.append('full_drop')
+    return inputs
+
+
+def _init_worker(requests):
+    _worker.requests = requests
+
+
+def _decide(decide: Decide, width, height, packed_state: bytes, preview: typing.Tuple[int, ...], request: int):
+    requests = _worker.requests
+    state = GameStateCodec(width, height).unpack(packed_state)
+    # every cancel counts the requests up, a decision is stale once the count moved on
+    return decide(state.board, [SHAPES[i] for i in preview], lambda: requests.value != request)
+
+
+class DecisionWorker:
+    def __init__(self, decide: Decide = None, use_process=False, preview=1):
+        self.decide = decide or SearchDecider(depth=preview + 1)
+        self.preview = preview
+        # spawned, a forked process could inherit locks held by the threads of the game
+        context = multiprocessing.get_context('spawn')
+        # shared with the worker, which reads it to notice that its request was cancelled
+        self._requests = context.Value('L', 0)
+        self._executor = concurrent.futures.ProcessPoolExecutor(1, context, _init_worker, (self._requests,)) \
+            if use_process else concurrent.futures.ThreadPoolExecutor(1, initializer=_init_worker,
+                                                                      initargs=(self._requests,))
+        self._future = None
+
+    def request(self, state: GameState, preview: typing.Sequence[typing.Type[Shape]] = ()):
+        """Start deciding for the active piece of a state, a pending decision is cancelled"""
+        self.cancel()
+        board = state.board
+        packed_state = GameStateCodec(board.width, board.height).pack(state)
+        self._future = self._executor.submit(_decide, self.decide, board.width, board.height, packed_state,
+                                             tuple(SHAPES.index(shape) for shape in preview[:self.preview]),
+                                             self._requests.value)
+
+    def is_thinking(self) -> bool:
+        return self._future is not None and not self._future.done()
+
+    def poll(self) -> typing.Optional[typing.List[str]]:
+        """The inputs of the decision once it is made, never waits for it"""
+        future = self._future
+        if future is None or not future.done():
+            return None
+        self._future = None
+        try:
+            placement = future.result()
+        except Exception:
+            _logger.exception("Decision failed")
+            return None
+        return placement_inputs(placement) if placement else None
+
+    def cancel(self):
+        # a decision that already started stops at its next check of cancelled, its result is dropped
+        if self._future is not None:
+            with self._requests.get_lock():
+                self._requests.value += 1
+            self._future.cancel()
+            self._future = None
+
+    def close(self):
+        self.cancel()
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,3 +1,4 @@
 from .piece import BoardPiece
 from .board import Board
-from .block import BoardBlock
\ No newline at end of file
+from .block import BoardBlock
+from .events import BoardEvent
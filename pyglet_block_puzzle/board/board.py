@@ -3,11 +3,14 @@ import typing
 
 from pyglet_block_puzzle.board.block import BoardBlock
 from pyglet_block_puzzle.board.board_printer import BoardPrinter
+from pyglet_block_puzzle.board.events import BoardEvent
 from pyglet_block_puzzle.board.piece import BoardPiece
 from pyglet_block_puzzle.shape import Shape
 
 _logger = logging.getLogger(__name__)
 
+BoardSubscriber = typing.Callable[[BoardEvent, typing.Any], None]
+
 
 class Board:
     EMPTY_SPACE = ' '
@@ -23,6 +26,28 @@ class Board:
         self._spawn_position = BoardBlock(self.width // 2 - 2, 0)
         self._print_board = print_board
         self._board_printer = BoardPrinter(self._board, width, height)
+        # index of the occupied cells and the number of them in each row, kept with every change
+        self._occupied = {}
+        self._row_sizes = [0] * height
+        self._blocks: typing.Optional[typing.Dict[typing.Tuple[int, int], str]] = None
+        self._subscribers: typing.List[BoardSubscriber] = []
+        self._changed_cells = []
+
+    def subscribe(self, subscriber: BoardSubscriber):
+        self._subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber: BoardSubscriber):
+        self._subscribers.remove(subscriber)
+
+    def _publish(self, event: BoardEvent, data=None):
+        for subscriber in self._subscribers:
+            subscriber(event, data)
+
+    def _publish_changed_cells(self):
+        if self._changed_cells:
+            changed_cells = list(dict.fromkeys(self._changed_cells))
+            self._changed_cells.clear()
+            self._publish(BoardEvent.CELLS_CHANGED, changed_cells)
 
     def move_right(self):
         self._move_active_piece(1)
@@ -55,7 +80,7 @@ class Board:
                 self._move_piece(self._active_piece, moved_piece)
                 self._active_piece = moved_piece
             else:
-                self._active_piece = None
+                self._lock_active_piece()
 
         if self._print_board:
             self._board_printer.print_to_console()
@@ -73,57 +98,114 @@ class Board:
     def is_piece_active(self):
         return self._active_piece is not None
 
+    def end_game(self):
+        self._game_over = True
+        self._publish(BoardEvent.GAME_OVER)
+
+    def _lock_active_piece(self):
+        locked_piece = self._active_piece
+        self._active_piece = None
+        if self._subscribers:
+            self._publish(BoardEvent.PIECE_LOCKED, locked_piece.copy())
+
+    def fits(self, piece: BoardPiece) -> bool:
+        """Check if the piece can be at the given position, the cells of the active piece are ignored"""
+        return self._is_legal_position(piece, self._active_piece)
+
+    def get_active_piece(self) -> typing.Optional[BoardPiece]:
+        if self._active_piece:
+            return self._active_piece.copy()
+        return None
+
+    def set_active_piece(self, piece: typing.Optional[BoardPiece]):
+        """
+        Put the active piece at the given position without checking for collisions,
+        setting it to None locks the current piece in place
+        """
+        if piece:
+            piece = piece.copy()
+            self._move_piece(self._active_piece, piece)
+            self._active_piece = piece
+        elif self._active_piece:
+            self._lock_active_piece()
+
     def any_rows_completed(self) -> bool:
         return len(self._calc_completed_rows()) > 0
 
+    def get_completed_rows(self) -> typing.List[int]:
+        return self._calc_completed_rows()
+
     def clear_completed_rows(self) -> int:
         completed_rows = self._calc_completed_rows()
         _logger.info(f"Clearing {len(completed_rows)} lines")
-        _logger.debug(f"Clearing rows: {completed_rows}")
-        for row_number in completed_rows[::-1]:
+        return self.clear_rows(completed_rows)
+
+    def clear_rows(self, rows: typing.List[int]) -> int:
+        _logger.debug(f"Clearing rows: {rows}")
+        for row_number in rows[::-1]:
             _logger.debug(f"Clearing row {row_number}")
             for col in range(self.width):
-                self._board[col][row_number] = self.EMPTY_SPACE
+                self._set_cell(col, row_number, self.EMPTY_SPACE, publish=False)
+        if rows:
+            self._publish(BoardEvent.ROWS_CLEARED, list(rows))
         self._skip_empty_rows()
-        return len(completed_rows)
+        return len(rows)
 
     def _calc_completed_rows(self) -> typing.List[int]:
-        completed_rows = [self._is_row_full(row) for row in self._transposed_board()]
-        return [i for i, row_completed, in enumerate(completed_rows) if row_completed]
+        return [i for i, row_size in enumerate(self._row_sizes) if row_size == self.width]
 
     def _calc_empty_rows(self):
-        completed_rows = [self._is_row_empty(row) for row in self._transposed_board()]
-        return [i for i, row_completed, in enumerate(completed_rows) if row_completed]
-
-    def _transposed_board(self):
-        return [*zip(*self._board)][::]
+        return [i for i, row_size in enumerate(self._row_sizes) if row_size == 0]
 
     def _skip_empty_rows(self):
         # from bottom to top
+        row_sizes = self._row_sizes
+        origins = list(range(self.height))
         swapped = True
-        transposed_board = self._transposed_board()
         while swapped:
             swapped = False
             row_number = self.height - 1
             while row_number > 1:
-                if self._is_row_empty(transposed_board[row_number]) and \
-                        not self._is_row_empty(transposed_board[row_number - 1]):
+                if row_sizes[row_number] == 0 and row_sizes[row_number - 1] != 0:
                     _logger.debug(f"Swapping rows {row_number}, {row_number - 1}")
                     self._swap_rows(row_number, row_number - 1)
-                    transposed_board = self._transposed_board()
+                    origins[row_number], origins[row_number - 1] = origins[row_number - 1], origins[row_number]
                     swapped = True
                 row_number -= 1
+        shifted_rows = [(origin, row) for row, origin in enumerate(origins)
+                        if origin != row and row_sizes[row]]
+        if shifted_rows:
+            self._publish(BoardEvent.ROWS_SHIFTED, shifted_rows)
 
     def _swap_rows(self, row_num_a, row_num_b):
+        occupied = self._occupied
         for col in range(self.width):
-            self._board[col][row_num_a], self._board[col][row_num_b] = \
-                self._board[col][row_num_b], self._board[col][row_num_a]
-
-    def _is_row_empty(self, row):
-        return all([self.EMPTY_SPACE == b for b in row])
-
-    def _is_row_full(self, row):
-        return self.EMPTY_SPACE not in row
+            column = self._board[col]
+            column[row_num_a], column[row_num_b] = column[row_num_b], column[row_num_a]
+            for row in (row_num_a, row_num_b):
+                if column[row] == self.EMPTY_SPACE:
+                    occupied.pop((col, row), None)
+                else:
+                    occupied[(col, row)] = column[row]
+        self._row_sizes[row_num_a], self._row_sizes[row_num_b] = \
+            self._row_sizes[row_num_b], self._row_sizes[row_num_a]
+        self._blocks = None
+
+    def _set_cell(self, x, y, block_id, publish=True):
+        old_block_id = self._board[x][y]
+        if old_block_id == block_id:
+            return
+        self._board[x][y] = block_id
+        if block_id == self.EMPTY_SPACE:
+            del self._occupied[(x, y)]
+            self._row_sizes[y] -= 1
+        else:
+            self._occupied[(x, y)] = block_id
+            if old_block_id == self.EMPTY_SPACE:
+                self._row_sizes[y] += 1
+        self._blocks = None
+        if publish and self._subscribers:
+            self._changed_cells.append((x, y))
 
     def spawn_piece(self, piece: Shape):
         new_piece = [BoardBlock(x, y) + self.spawn_position for (x, y) in piece.cords]
@@ -132,20 +214,28 @@ class Board:
         _logger.info(f"Spawning new piece: {new_piece.shape.__name__}")
         _logger.debug(f"Spawning new piece: {new_piece}")
 
-        if not self._is_legal_position(new_piece):
-            _logger.info("Illegal start position, ending game")
-            self._game_over = True
-
+        game_over = not self._is_legal_position(new_piece)
         self._active_piece = new_piece
         self._move_piece(None, self._active_piece)
+        if self._subscribers:
+            self._publish(BoardEvent.PIECE_SPAWNED, new_piece.copy())
+
+        if game_over:
+            _logger.info("Illegal start position, ending game")
+            self.end_game()
 
     def get_blocks(self) -> typing.Dict[typing.Tuple[int, int], str]:
-        blocks = {}
-        for i, column in enumerate(self._board):
-            for j, cell in enumerate(column):
-                if cell != self.EMPTY_SPACE:
-                    blocks[(i, j)] = cell
-        return blocks
+        """The occupied cells, the same dict is returned until the board changes so it must not be modified"""
+        if self._blocks is None:
+            self._blocks = dict(self._occupied)
+        return self._blocks
+
+    def get_block(self, x, y) -> str:
+        return self._board[x][y]
+
+    def set_block(self, x, y, block_id):
+        self._set_cell(x, y, block_id)
+        self._publish_changed_cells()
 
     def rotate(self):
         if self._active_piece:
@@ -166,9 +256,10 @@ class Board:
     def _move_piece(self, old_piece, new_piece):
         if old_piece:
             for block in old_piece:
-                self._board[block.x][block.y] = self.EMPTY_SPACE
+                self._set_cell(block.x, block.y, self.EMPTY_SPACE)
         for block in new_piece:
-            self._board[block.x][block.y] = new_piece.id
+            self._set_cell(block.x, block.y, new_piece.id)
+        self._publish_changed_cells()
 
     def _is_legal_position(self, target, source=None):
         return self._is_in_boundaries(target) and \
@@ -0,0 +1,20 @@
+from enum import Enum, auto
+
+
+class BoardEvent(Enum):
+    """
+    Changes published by a Board to its subscribers, with the data passed along:
+
+    CELLS_CHANGED: list of (x, y) cells that were set or cleared
+    ROWS_CLEARED: list of the cleared row numbers
+    ROWS_SHIFTED: list of (old row, new row) for every row moved by the clearing
+    PIECE_SPAWNED: the spawned BoardPiece
+    PIECE_LOCKED: the BoardPiece locked in place
+    GAME_OVER: None
+    """
+    CELLS_CHANGED = auto()
+    ROWS_CLEARED = auto()
+    ROWS_SHIFTED = auto()
+    PIECE_SPAWNED = auto()
+    PIECE_LOCKED = auto()
+    GAME_OVER = auto()
@@ -0,0 +1,297 @@
+"""
+Board with the same rules and interface as Board, made for simulations.
+
+Settled cells are kept as one bitmask per row plus a buffer of shape codes,
+the active piece is a pose in a precomputed rotation table, so moving and
+rotating the piece only checks a few bits and allocates nothing.
+"""
+import logging
+import typing
+
+from pyglet_block_puzzle.board.block import BoardBlock
+from pyglet_block_puzzle.board.piece import BoardPiece
+from pyglet_block_puzzle.shape import Shape, SHAPES
+
+_logger = logging.getLogger(__name__)
+
+_shape_ids = [' '] + [shape.id for shape in SHAPES]
+_shape_codes = {shape_id: code for code, shape_id in enumerate(_shape_ids)}
+_rotation_tables = {}
+
+
+def _shape_code(shape_id) -> int:
+    if shape_id not in _shape_codes:
+        _shape_codes[shape_id] = len(_shape_ids)
+        _shape_ids.append(shape_id)
+    return _shape_codes[shape_id]
+
+
+def rotation_table(shape: typing.Type[Shape]):
+    """
+    The cells of every rotation state of a shape and the state each rotation leads to.
+
+    States are computed with BoardPiece.rotate, rotating a piece commutes with
+    moving it, so the same table holds anywhere on the board.
+    """
+    if shape not in _rotation_tables:
+        piece = BoardPiece(shape,
+                           [BoardBlock(x, y) for (x, y) in shape.cords],
+                           BoardBlock(shape.center[0], shape.center[1]))
+        states = {}
+        cells = []
+        next_states = []
+        while True:
+            state_cells = tuple((block.x, block.y) for block in piece)
+            key = frozenset(state_cells)
+            if key in states:
+                next_states.append(states[key])
+                break
+            if cells:
+                next_states.append(len(cells))
+            states[key] = len(cells)
+            cells.append(state_cells)
+            piece.rotate()
+        _rotation_tables[shape] = (tuple(cells), tuple(next_states))
+    return _rotation_tables[shape]
+
+
+class FastBoard:
+    EMPTY_SPACE = ' '
+
+    def __init__(self, width, height, print_board=False, cells=None):
+        self.height = height
+        self.width = width
+        self._rows = [0] * height
+        # shape codes of the settled cells, row after row
+        self._cells = cells if cells is not None else bytearray(width * height)
+        self._cells[:] = bytes(width * height)
+        self._full_row = (1 << width) - 1
+        self._game_over = False
+        self._spawn_position = BoardBlock(self.width // 2 - 2, 0)
+        self._shape = None
+        self._shape_code = 0
+        self._state_cells = ()
+        self._next_states = ()
+        self._state = 0
+        self._x = 0
+        self._y = 0
+
+    @property
+    def cells(self):
+        return self._cells
+
+    @property
+    def rows(self) -> typing.List[int]:
+        """Bitmask of the settled cells of every row, bit x is column x"""
+        return self._rows
+
+    def load(self, cells):
+        """Replace the settled cells with the shape codes of a buffer laid out like cells"""
+        self._cells[:] = cells
+        width = self.width
+        for y in range(self.height):
+            row = 0
+            for x, code in enumerate(self._cells[y * width:(y + 1) * width]):
+                if code:
+                    row |= 1 << x
+            self._rows[y] = row
+
+    def copy(self) -> 'FastBoard':
+        board = FastBoard.__new__(FastBoard)
+        board.__dict__.update(self.__dict__)
+        board._rows = list(self._rows)
+        board._cells = bytearray(self._cells)
+        return board
+
+    @property
+    def spawn_position(self) -> BoardBlock:
+        return self._spawn_position
+
+    @spawn_position.setter
+    def spawn_position(self, value: BoardBlock):
+        self._spawn_position = value
+
+    @property
+    def active_shape_code(self) -> int:
+        return self._shape_code if self._shape else 0
+
+    def is_game_over(self):
+        return self._game_over
+
+    def is_piece_active(self):
+        return self._shape is not None
+
+    def _fits(self, state, x, y):
+        rows = self._rows
+        for cell_x, cell_y in self._state_cells[state]:
+            cell_x += x
+            cell_y += y
+            if not (0 <= cell_x < self.width and 0 <= cell_y < self.height) or rows[cell_y] >> cell_x & 1:
+                return False
+        return True
+
+    def spawn_piece(self, piece: typing.Type[Shape]):
+        _logger.info(f"Spawning new piece: {piece.__name__}")
+        self._shape = piece
+        self._shape_code = _shape_code(piece.id)
+        self._state_cells, self._next_states = rotation_table(piece)
+        self._state = 0
+        self._x = self._spawn_position.x
+        self._y = self._spawn_position.y
+        if not self._fits(0, self._x, self._y):
+            _logger.info("Illegal start position, ending game")
+            self._game_over = True
+            # the piece takes over the cells it was spawned on, like in Board
+            for cell_x, cell_y in self._state_cells[0]:
+                self._set_cell(cell_x + self._x, cell_y + self._y, 0)
+
+    def _set_cell(self, x, y, code):
+        if code:
+            self._rows[y] |= 1 << x
+        else:
+            self._rows[y] &= ~(1 << x)
+        self._cells[y * self.width + x] = code
+
+    def _lock_piece(self):
+        for cell_x, cell_y in self._state_cells[self._state]:
+            self._set_cell(cell_x + self._x, cell_y + self._y, self._shape_code)
+        self._shape = None
+
+    def move_right(self):
+        self._move_active_piece(1)
+
+    def move_left(self):
+        self._move_active_piece(-1)
+
+    def _move_active_piece(self, direction_offset):
+        if not self._shape:
+            raise RuntimeError("No active piece")
+        if self._fits(self._state, self._x + direction_offset, self._y):
+            self._x += direction_offset
+
+    def rotate(self):
+        if self._shape:
+            next_state = self._next_states[self._state]
+            if self._fits(next_state, self._x, self._y):
+                self._state = next_state
+
+    def drop(self):
+        if self._shape:
+            if self._fits(self._state, self._x, self._y + 1):
+                self._y += 1
+            else:
+                self._lock_piece()
+
+    def full_drop(self):
+        if not self._shape:
+            return 0
+        # counted like Board, the last drop that locks the piece counts as well
+        cells_dropped = 1
+        while self._fits(self._state, self._x, self._y + 1):
+            self._y += 1
+            cells_dropped += 1
+        self._lock_piece()
+        return cells_dropped
+
+    def _rotate_for_placement(self, state, x, y):
+        """Rotate like placement.apply_placement, blocked rotations are retried one row lower"""
+        while True:
+            next_state = self._next_states[state]
+            if self._fits(next_state, x, y):
+                return next_state, y
+            if not self._fits(state, x, y + 1):
+                return None, y
+            y += 1
+
+    def place(self, rotations, shift) -> int:
+        """
+        Rotate, shift and hard drop the active piece like placement.apply_placement,
+        returns the number of cells dropped or -1 without changing the board if the
+        placement can not be reached
+        """
+        if not self._shape:
+            raise RuntimeError("No active piece")
+        state, x, y = self._state, self._x, self._y
+        for _ in range(rotations):
+            state, y = self._rotate_for_placement(state, x, y)
+            if state is None:
+                return -1
+        direction = 1 if shift > 0 else -1
+        for _ in range(abs(shift)):
+            if not self._fits(state, x + direction, y):
+                return -1
+            x += direction
+        self._state, self._x, self._y = state, x, y
+        return self.full_drop()
+
+    def get_shift_limits(self, rotations) -> typing.Optional[typing.Tuple[int, int]]:
+        """Lowest and highest shift reachable after the given number of rotations, None if unreachable"""
+        state, x, y = self._state, self._x, self._y
+        for _ in range(rotations):
+            state, y = self._rotate_for_placement(state, x, y)
+            if state is None:
+                return None
+        left = 0
+        while self._fits(state, x + left - 1, y):
+            left -= 1
+        right = 0
+        while self._fits(state, x + right + 1, y):
+            right += 1
+        return left, right
+
+    def _piece_rows(self):
+        rows = list(self._rows)
+        if self._shape:
+            for cell_x, cell_y in self._state_cells[self._state]:
+                rows[cell_y + self._y] |= 1 << (cell_x + self._x)
+        return rows
+
+    def any_rows_completed(self) -> bool:
+        return len(self.get_completed_rows()) > 0
+
+    def get_completed_rows(self) -> typing.List[int]:
+        return [i for i, row in enumerate(self._piece_rows()) if row == self._full_row]
+
+    def clear_completed_rows(self) -> int:
+        completed_rows = self.get_completed_rows()
+        _logger.info(f"Clearing {len(completed_rows)} lines")
+        for row_number in completed_rows:
+            self._rows[row_number] = 0
+            self._cells[row_number * self.width:(row_number + 1) * self.width] = bytes(self.width)
+        if completed_rows:
+            self._skip_empty_rows()
+        return len(completed_rows)
+
+    def _skip_empty_rows(self):
+        # the same passes as Board, the top row is never moved
+        rows = self._rows
+        swapped = True
+        while swapped:
+            swapped = False
+            row_number = self.height - 1
+            while row_number > 1:
+                if not rows[row_number] and rows[row_number - 1]:
+                    self._swap_rows(row_number, row_number - 1)
+                    swapped = True
+                row_number -= 1
+
+    def _swap_rows(self, row_num_a, row_num_b):
+        rows, cells, width = self._rows, self._cells, self.width
+        rows[row_num_a], rows[row_num_b] = rows[row_num_b], rows[row_num_a]
+        row_a = bytes(cells[row_num_a * width:(row_num_a + 1) * width])
+        cells[row_num_a * width:(row_num_a + 1) * width] = cells[row_num_b * width:(row_num_b + 1) * width]
+        cells[row_num_b * width:(row_num_b + 1) * width] = row_a
+
+    def get_blocks(self) -> typing.Dict[typing.Tuple[int, int], str]:
+        blocks = {}
+        for y, row in enumerate(self._rows):
+            x = 0
+            while row:
+                if row & 1:
+                    blocks[(x, y)] = _shape_ids[self._cells[y * self.width + x]]
+                row >>= 1
+                x += 1
+        if self._shape:
+            for cell_x, cell_y in self._state_cells[self._state]:
+                blocks[(cell_x + self._x, cell_y + self._y)] = self._shape.id
+        return blocks
@@ -0,0 +1,142 @@
+"""
+Board features for bots, analytics and difficulty tuning.
+
+Boards are handled as boolean arrays of shape (height, width) where row 0 is the
+top of the board, a batch of boards is an array of shape (n, height, width) and
+all the features of the batch are computed together.
+"""
+import typing
+
+import numpy as np
+
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.events import BoardEvent
+
+FEATURES = (
+    'aggregate_height',
+    'holes',
+    'bumpiness',
+    'well_depth',
+    'row_transitions',
+    'column_transitions',
+    'completed_lines',
+)
+
+
+def board_to_array(board: Board, include_active_piece=True, out: np.ndarray = None) -> np.ndarray:
+    if out is None:
+        out = np.zeros((board.height, board.width), dtype=bool)
+    else:
+        out.fill(False)
+    for (x, y) in board.get_blocks():
+        out[y, x] = True
+    if not include_active_piece and board.is_piece_active():
+        for block in board.get_active_piece():
+            out[block.y, block.x] = False
+    return out
+
+
+def boards_to_array(boards: typing.Sequence[Board], include_active_piece=True) -> np.ndarray:
+    grids = np.zeros((len(boards), boards[0].height, boards[0].width), dtype=bool)
+    for grid, board in zip(grids, boards):
+        board_to_array(board, include_active_piece, out=grid)
+    return grids
+
+
+def _column_features(grids: np.ndarray):
+    """Height, holes and transitions of every column in grids of shape (..., height, width)"""
+    height = grids.shape[-2]
+    heights = np.where(grids.any(axis=-2), height - grids.argmax(axis=-2), 0)
+    covered = np.logical_or.accumulate(grids, axis=-2)
+    holes = np.count_nonzero(covered & ~grids, axis=-2)
+    # the floor counts as filled, above the board is empty
+    transitions = np.count_nonzero(grids[..., 1:, :] != grids[..., :-1, :], axis=-2) + \
+        grids[..., 0, :] + ~grids[..., -1, :]
+    return heights, holes, transitions
+
+
+def _row_features(grids: np.ndarray):
+    """Transitions and completion of every row in grids of shape (..., height, width)"""
+    # the walls count as filled
+    transitions = np.count_nonzero(grids[..., 1:] != grids[..., :-1], axis=-1) + ~grids[..., 0] + ~grids[..., -1]
+    return transitions, grids.all(axis=-1)
+
+
+def _height_features(heights: np.ndarray, height):
+    bumpiness = np.abs(np.diff(heights, axis=-1)).sum(axis=-1)
+    walls = np.full(heights.shape[:-1] + (1,), height)
+    padded = np.concatenate([walls, heights, walls], axis=-1)
+    wells = np.minimum(padded[..., :-2], padded[..., 2:]) - heights
+    return bumpiness, np.maximum(wells, 0).sum(axis=-1)
+
+
+def evaluate(grids: np.ndarray) -> np.ndarray:
+    """Features of a batch of boards, returns an array of shape (n, len(FEATURES))"""
+    heights, holes, column_transitions = _column_features(grids)
+    row_transitions, completed = _row_features(grids)
+    bumpiness, well_depth = _height_features(heights, grids.shape[-2])
+    return np.stack([
+        heights.sum(axis=-1),
+        holes.sum(axis=-1),
+        bumpiness,
+        well_depth,
+        row_transitions.sum(axis=-1),
+        column_transitions.sum(axis=-1),
+        completed.sum(axis=-1),
+    ], axis=-1)
+
+
+def evaluate_board(board: Board, include_active_piece=True) -> typing.Dict[str, int]:
+    return dict(zip(FEATURES, evaluate(board_to_array(board, include_active_piece)).tolist()))
+
+
+class FeatureTracker:
+    """
+    Keep the features of a board up to date from the cells changed since the last update,
+    only the columns and rows of the changed cells are computed again
+    """
+    def __init__(self, board: Board):
+        self._board = board
+        self.reset()
+
+    # noinspection PyAttributeOutsideInit
+    def reset(self):
+        self._grid = board_to_array(self._board)
+        self._heights, self._holes, self._column_transitions = _column_features(self._grid)
+        self._row_transitions, self._completed = _row_features(self._grid)
+
+    def update(self, cells: typing.Iterable[typing.Tuple[int, int]]):
+        cells = list(cells)
+        if not cells:
+            return
+        for x, y in cells:
+            self._grid[y, x] = self._board.get_block(x, y) != Board.EMPTY_SPACE
+        columns = sorted({x for x, _ in cells})
+        rows = sorted({y for _, y in cells})
+        self._heights[columns], self._holes[columns], self._column_transitions[columns] = \
+            _column_features(self._grid[:, columns])
+        self._row_transitions[rows], self._completed[rows] = _row_features(self._grid[rows])
+
+    def update_rows_cleared(self):
+        """Cleared rows shift the whole board, so everything is computed again"""
+        self.reset()
+
+    def on_board_event(self, event: BoardEvent, data):
+        """Board subscriber, keeps the tracker updated with board.subscribe(tracker.on_board_event)"""
+        if event == BoardEvent.CELLS_CHANGED:
+            self.update(data)
+        elif event in (BoardEvent.ROWS_CLEARED, BoardEvent.ROWS_SHIFTED):
+            self.update_rows_cleared()
+
+    @property
+    def features(self) -> typing.Dict[str, int]:
+        bumpiness, well_depth = _height_features(self._heights, self._board.height)
+        return dict(zip(FEATURES, (
+            int(self._heights.sum()),
+            int(self._holes.sum()),
+            int(bumpiness),
+            int(well_depth),
+            int(self._row_transitions.sum()),
+            int(self._column_transitions.sum()),
+            int(self._completed.sum()),
+        )))
@@ -0,0 +1,106 @@
+"""
+Placements of the active piece for bots.
+
+A placement rotates the active piece, shifts it sideways and hard drops it.
+Rotations that are blocked (like at the top of the board) are retried after
+dropping the piece by one row, the same way a player would do it.
+"""
+import typing
+from dataclasses import dataclass, field
+
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.piece import BoardPiece
+
+
+@dataclass(frozen=True)
+class Placement:
+    rotations: int
+    shift: int
+    landing: typing.Optional[BoardPiece] = field(default=None, compare=False, repr=False)
+
+
+def _rotate(board: Board, piece: BoardPiece) -> typing.Optional[BoardPiece]:
+    while True:
+        rotated = piece.copy()
+        rotated.rotate()
+        if board.fits(rotated):
+            return rotated
+        piece = piece.copy()
+        piece.move(y=1)
+        if not board.fits(piece):
+            return None
+
+
+def _land(board: Board, piece: BoardPiece, own_cells) -> BoardPiece:
+    cells = [(block.x, block.y) for block in piece]
+    dy = 0
+    while all(y + dy + 1 < board.height and
+              ((x, y + dy + 1) in own_cells or board.get_block(x, y + dy + 1) == Board.EMPTY_SPACE)
+              for x, y in cells):
+        dy += 1
+    landed = piece.copy()
+    landed.move(y=dy)
+    return landed
+
+
+def _shifts(board: Board, piece: BoardPiece):
+    yield 0, piece
+    for direction in (-1, 1):
+        shifted = piece
+        shift = 0
+        while True:
+            shifted = shifted.copy()
+            shifted.move(x=direction)
+            if not board.fits(shifted):
+                break
+            shift += direction
+            yield shift, shifted
+
+
+def get_placements(board: Board) -> typing.List[Placement]:
+    """All the placements of the active piece that end in a different position"""
+    piece = board.get_active_piece()
+    if not piece:
+        return []
+    placements = []
+    landed = set()
+    own_cells = {(block.x, block.y) for block in piece}
+    for rotations in range(4):
+        if rotations:
+            piece = _rotate(board, piece)
+            if not piece:
+                break
+        for shift, shifted in _shifts(board, piece):
+            landing = _land(board, shifted, own_cells)
+            cells = frozenset((block.x, block.y) for block in landing)
+            if cells not in landed:
+                landed.add(cells)
+                placements.append(Placement(rotations, shift, landing))
+    return placements
+
+
+def apply_placement(board: Board, placement: Placement) -> int:
+    """Move the active piece to the placement and hard drop it, returns the number of cells dropped"""
+    if not board.is_piece_active():
+        raise RuntimeError("No active piece")
+    for _ in range(placement.rotations):
+        while True:
+            rotated = board.get_active_piece()
+            rotated.rotate()
+            if board.fits(rotated):
+                board.rotate()
+                break
+            board.drop()
+            if not board.is_piece_active():
+                raise ValueError(f"Can not rotate the piece for {placement}")
+    direction = 1 if placement.shift > 0 else -1
+    for _ in range(abs(placement.shift)):
+        shifted = board.get_active_piece()
+        shifted.move(x=direction)
+        if not board.fits(shifted):
+            raise ValueError(f"Can not shift the piece for {placement}")
+        if direction > 0:
+            board.move_right()
+        else:
+            board.move_left()
+    return board.full_drop()
@@ -0,0 +1,379 @@
+"""
+Compact binary stream of a board state for spectators.
+
+A stream starts with a keyframe holding the whole board and continues with one
+delta message per tick. A delta is a list of operations the decoder replays on
+its own board (piece moved, locked, spawned, rows cleared, ...), so steady
+state play costs only a few bytes per tick.
+"""
+import logging
+import typing
+from math import floor
+
+from pyglet_block_puzzle.board.block import BoardBlock
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.piece import BoardPiece
+from pyglet_block_puzzle.shape import SHAPES, SHAPE_CODES
+
+_logger = logging.getLogger(__name__)
+
+KEYFRAME = ord('K')
+DELTA = ord('D')
+
+OP_MOVE = 0x10
+OP_LOCK = 0x20
+OP_SPAWN = 0x30
+OP_PIECE = 0x40
+OP_CLEAR = 0x50
+OP_CELLS = 0x60
+OP_SCORE = 0x70
+OP_LEVEL = 0x80
+OP_GAME_OVER = 0x90
+
+_FLAG_GAME_OVER = 1
+_FLAG_ACTIVE_PIECE = 2
+
+
+def _write_varint(buf: bytearray, value: int):
+    while value > 0x7f:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def _write_signed(buf: bytearray, value: int):
+    _write_varint(buf, value * 2 if value >= 0 else -value * 2 - 1)
+
+
+def _code_of(cell) -> int:
+    if cell == Board.EMPTY_SPACE:
+        return 0
+    return SHAPE_CODES[cell]
+
+
+def _id_of(code) -> str:
+    if code == 0:
+        return Board.EMPTY_SPACE
+    return SHAPES[code - 1].id
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self._data = data
+        self._pos = 0
+
+    def at_end(self):
+        return self._pos >= len(self._data)
+
+    def byte(self) -> int:
+        value = self._data[self._pos]
+        self._pos += 1
+        return value
+
+    def varint(self) -> int:
+        value = 0
+        shift = 0
+        while True:
+            b = self.byte()
+            value |= (b & 0x7f) << shift
+            if not b & 0x80:
+                return value
+            shift += 7
+
+    def signed(self) -> int:
+        value = self.varint()
+        return value // 2 if not value & 1 else -(value + 1) // 2
+
+
+def _write_piece(buf: bytearray, piece: BoardPiece):
+    center = piece.center
+    base_x, base_y = floor(center.x), floor(center.y)
+    buf.append(SHAPE_CODES[piece.id])
+    _write_signed(buf, int(center.x * 2))
+    _write_signed(buf, int(center.y * 2))
+    blocks = piece.blocks
+    _write_varint(buf, len(blocks))
+    for block in blocks:
+        _write_signed(buf, block.x - base_x)
+        _write_signed(buf, block.y - base_y)
+
+
+def _read_piece(reader: _Reader) -> BoardPiece:
+    shape = SHAPES[reader.byte() - 1]
+    center_x, center_y = reader.signed(), reader.signed()
+    center = BoardBlock(center_x // 2 if center_x % 2 == 0 else center_x / 2,
+                        center_y // 2 if center_y % 2 == 0 else center_y / 2)
+    base_x, base_y = floor(center.x), floor(center.y)
+    blocks = [BoardBlock(base_x + reader.signed(), base_y + reader.signed())
+              for _ in range(reader.varint())]
+    return BoardPiece(shape, blocks, center)
+
+
+def _find_move(source: BoardPiece, target: BoardPiece):
+    """Find (rotations, dx, dy) that turns source into target, None if target is a different piece"""
+    if source.shape is not target.shape:
+        return None
+    candidate = source.copy()
+    for rotations in range(4):
+        dx = target.center.x - candidate.center.x
+        dy = target.center.y - candidate.center.y
+        if dy >= 0 and dx == int(dx) and dy == int(dy):
+            moved = candidate.copy()
+            moved.move(int(dx), int(dy))
+            if moved.blocks == target.blocks:
+                return rotations, int(dx), int(dy)
+        candidate.rotate()
+    return None
+
+
+def _find_landing(source: BoardPiece, target: typing.Optional[BoardPiece], mirror: Board, blocks):
+    """
+    Find the (rotations, dx, dy) of a piece that moved and locked within the same tick,
+    the rows it completed may have been cleared already
+    """
+    settled = dict(mirror.get_blocks())
+    for block in source:
+        del settled[(block.x, block.y)]
+    if target:
+        blocks = dict(blocks)
+        for block in target:
+            blocks.pop((block.x, block.y), None)
+
+    def fits(cells):
+        return all(0 <= x < mirror.width and 0 <= y < mirror.height and (x, y) not in settled
+                   for x, y in cells)
+
+    candidate = source.copy()
+    for rotations in range(4):
+        cells = [(block.x, block.y) for block in candidate]
+        for dx in range(-mirror.width, mirror.width + 1):
+            if not fits([(x + dx, y) for x, y in cells]):
+                continue
+            dy = 0
+            while fits([(x + dx, y + dy + 1) for x, y in cells]):
+                dy += 1
+            landed = dict(settled)
+            landed.update(((x + dx, y + dy), source.id) for x, y in cells)
+            if blocks == landed or blocks == _compact_rows(landed, mirror.width):
+                return rotations, dx, dy
+        candidate.rotate()
+    return None
+
+
+def _compact_rows(blocks, width):
+    row_sizes = {}
+    for _, y in blocks:
+        row_sizes[y] = row_sizes.get(y, 0) + 1
+    full_rows = sorted(y for y, size in row_sizes.items() if size == width)
+    if not full_rows:
+        return blocks
+    return {(x, y + sum(1 for row in full_rows if row > y)): block_id
+            for (x, y), block_id in blocks.items() if y not in full_rows}
+
+
+def _row_runs(rows: typing.List[int]) -> typing.List[typing.Tuple[int, int]]:
+    runs = []
+    for row in sorted(rows):
+        if runs and runs[-1][0] + runs[-1][1] == row:
+            runs[-1] = (runs[-1][0], runs[-1][1] + 1)
+        else:
+            runs.append((row, 1))
+    return runs
+
+
+class BoardStreamDecoder:
+    def __init__(self):
+        self.board: typing.Optional[Board] = None
+        self.score = 0
+        self.level = 1
+
+    def decode(self, data: bytes) -> Board:
+        reader = _Reader(data)
+        message_type = reader.byte()
+        if message_type == KEYFRAME:
+            self._decode_keyframe(reader)
+        elif message_type == DELTA:
+            if self.board is None:
+                raise ValueError("Delta received before a keyframe")
+            while not reader.at_end():
+                self._apply_op(reader)
+        else:
+            raise ValueError(f"Unknown message type: {message_type}")
+        return self.board
+
+    def _decode_keyframe(self, reader: _Reader):
+        width, height = reader.varint(), reader.varint()
+        board = Board(width, height, print_board=False)
+        board.spawn_position = BoardBlock(reader.signed(), reader.signed())
+        flags = reader.byte()
+        self.score = reader.varint()
+        self.level = reader.varint()
+        index = 0
+        while index < width * height:
+            code, run = reader.byte(), reader.varint()
+            if code:
+                for i in range(index, index + run):
+                    board.set_block(i % width, i // width, _id_of(code))
+            index += run
+        if flags & _FLAG_ACTIVE_PIECE:
+            board.set_active_piece(_read_piece(reader))
+        if flags & _FLAG_GAME_OVER:
+            board.end_game()
+        self.board = board
+
+    def _apply_op(self, reader: _Reader):
+        op = reader.byte()
+        opcode, arg = op & 0xf0, op & 0x0f
+        board = self.board
+        if opcode == OP_MOVE:
+            piece = board.get_active_piece()
+            for _ in range(arg):
+                piece.rotate()
+            piece.move(reader.signed(), reader.signed())
+            board.set_active_piece(piece)
+        elif opcode == OP_LOCK:
+            board.set_active_piece(None)
+        elif opcode == OP_SPAWN:
+            board.spawn_piece(SHAPES[arg - 1])
+        elif opcode == OP_PIECE:
+            board.set_active_piece(None)
+            board.set_active_piece(_read_piece(reader))
+        elif opcode == OP_CLEAR:
+            rows = []
+            for _ in range(arg):
+                start, length = reader.varint(), reader.varint()
+                rows.extend(range(start, start + length))
+            board.clear_rows(rows)
+        elif opcode == OP_CELLS:
+            for _ in range(reader.varint()):
+                index, code = reader.varint(), reader.byte()
+                board.set_block(index % board.width, index // board.width, _id_of(code))
+        elif opcode == OP_SCORE:
+            self.score += reader.signed()
+        elif opcode == OP_LEVEL:
+            self.level = reader.varint()
+        elif opcode == OP_GAME_OVER:
+            board.end_game()
+        else:
+            raise ValueError(f"Unknown stream operation: {op}")
+
+
+class BoardStreamEncoder:
+    """
+    Encode a live board into stream messages.
+
+    The encoder keeps a decoder of its own as a mirror of what the spectators see,
+    anything the operations could not express is sent as raw cell changes so the
+    spectators never drift from the real board.
+    """
+    def __init__(self, board: Board):
+        self._board = board
+        self._mirror = BoardStreamDecoder()
+
+    def keyframe(self, score=0, level=1) -> bytes:
+        board = self._board
+        buf = bytearray([KEYFRAME])
+        _write_varint(buf, board.width)
+        _write_varint(buf, board.height)
+        _write_signed(buf, board.spawn_position.x)
+        _write_signed(buf, board.spawn_position.y)
+        piece = board.get_active_piece()
+        flags = _FLAG_GAME_OVER if board.is_game_over() else 0
+        if piece:
+            flags |= _FLAG_ACTIVE_PIECE
+        buf.append(flags)
+        _write_varint(buf, score)
+        _write_varint(buf, level)
+        blocks = board.get_blocks()
+        codes = [_code_of(blocks.get((i % board.width, i // board.width), Board.EMPTY_SPACE))
+                 for i in range(board.width * board.height)]
+        index = 0
+        while index < len(codes):
+            run = 1
+            while index + run < len(codes) and codes[index + run] == codes[index]:
+                run += 1
+            buf.append(codes[index])
+            _write_varint(buf, run)
+            index += run
+        if piece:
+            _write_piece(buf, piece)
+        data = bytes(buf)
+        self._mirror.decode(data)
+        return data
+
+    def delta(self, score=0, level=1) -> bytes:
+        if self._mirror.board is None:
+            raise RuntimeError("A keyframe must be encoded before any delta")
+        board = self._board
+        mirror = self._mirror.board
+        buf = bytearray()
+
+        source = mirror.get_active_piece()
+        target = board.get_active_piece()
+        move = _find_move(source, target) if source and target else None
+        if source and not move:
+            landed = _find_landing(source, target, mirror, board.get_blocks())
+            if landed and landed != (0, 0, 0):
+                self._encode_move(buf, landed)
+            buf.append(OP_LOCK)
+            self._apply_to_mirror(buf, 0)
+
+        applied = len(buf)
+        if not move:
+            self._encode_clear(buf, mirror.get_completed_rows(), board.get_completed_rows())
+        if target and not move:
+            spawned = [BoardBlock(x, y) + mirror.spawn_position for (x, y) in target.shape.cords]
+            if spawned == target.blocks:
+                buf.append(OP_SPAWN | SHAPE_CODES[target.id])
+            else:
+                buf.append(OP_PIECE)
+                _write_piece(buf, target)
+        elif move and move != (0, 0, 0):
+            self._encode_move(buf, move)
+        self._apply_to_mirror(buf, applied)
+
+        applied = len(buf)
+        self._encode_cells(buf, board.width, mirror.get_blocks(), board.get_blocks())
+        if board.is_game_over() and not mirror.is_game_over():
+            buf.append(OP_GAME_OVER)
+        if score != self._mirror.score:
+            buf.append(OP_SCORE)
+            _write_signed(buf, score - self._mirror.score)
+        if level != self._mirror.level:
+            buf.append(OP_LEVEL)
+            _write_varint(buf, level)
+        self._apply_to_mirror(buf, applied)
+        return bytes([DELTA]) + buf
+
+    def _apply_to_mirror(self, buf: bytearray, start):
+        if len(buf) > start:
+            self._mirror.decode(bytes([DELTA]) + buf[start:])
+
+    @staticmethod
+    def _encode_move(buf: bytearray, move):
+        rotations, dx, dy = move
+        buf.append(OP_MOVE | rotations)
+        _write_signed(buf, dx)
+        _write_signed(buf, dy)
+
+    @staticmethod
+    def _encode_cells(buf: bytearray, width, mirror_blocks, blocks):
+        changed = sorted((y * width + x, _code_of(blocks.get((x, y), Board.EMPTY_SPACE)))
+                         for (x, y) in mirror_blocks.keys() | blocks.keys()
+                         if mirror_blocks.get((x, y)) != blocks.get((x, y)))
+        if changed:
+            buf.append(OP_CELLS)
+            _write_varint(buf, len(changed))
+            for index, code in changed:
+                _write_varint(buf, index)
+                buf.append(code)
+
+    @staticmethod
+    def _encode_clear(buf: bytearray, locked_rows, current_rows):
+        if locked_rows and locked_rows != current_rows:
+            # more runs than fit the opcode are left to the raw cell changes
+            runs = _row_runs(locked_rows)[:0x0f]
+            buf.append(OP_CLEAR | len(runs))
+            for start, length in runs:
+                _write_varint(buf, start)
+                _write_varint(buf, length)
@@ -0,0 +1,31 @@
+"""
+Clocks for running a Game without waiting for the wall clock.
+
+Game takes any pyglet Clock, VirtualClock is one whose time only moves
+when it is advanced, so a game runs as fast as its callbacks and the same
+inputs replay the same game.
+"""
+import pyglet
+
+
+class VirtualClock(pyglet.clock.Clock):
+    def __init__(self, start=0.0):
+        self._now = start
+        super().__init__(time_function=lambda: self._now)
+
+    def advance(self, seconds) -> float:
+        """
+        Move the time forward, ticking at the due time of every interval callback
+        on the way, in order, and once at the end. Returns the new time.
+        """
+        target = self._now + seconds
+        # the due times are read from the heap of the pyglet 1.x Clock (setup.py pins pyglet<2),
+        # get_sleep_time can not replace it: it is 0 with a callback of every tick scheduled, and
+        # with sleep_idle False always. tests/test_clock.py pins the heap to get_sleep_time.
+        items = self._schedule_interval_items
+        while items and items[0].next_ts <= target:
+            self._now = max(self._now, items[0].next_ts)
+            self.tick()
+        self._now = target
+        self.tick()
+        return self._now
@@ -0,0 +1,122 @@
+"""
+Gym-style environments for training agents against the game, without pyglet.
+
+An action places the active piece, it is the index of a (rotations, shift) pair:
+``action = rotations * (2 * width - 1) + shift + width - 1``. Actions that can not
+be reached fall back to dropping the piece where it spawned, ``action_mask``
+tells which actions are reachable.
+
+Observations are preallocated arrays that are updated in place on every step:
+``board`` holds the shape code (see shape.SHAPE_CODES) of every settled cell and
+``piece`` the code of the active piece.
+"""
+import random
+import typing
+
+import numpy as np
+
+from pyglet_block_puzzle import rules
+from pyglet_block_puzzle.board.fast_board import FastBoard
+from pyglet_block_puzzle.shape import ShapeHelper
+
+ROTATIONS = 4
+
+
+class BlockPuzzleEnv:
+    def __init__(self, width=10, height=20, seed=None,
+                 board_out: np.ndarray = None, piece_out: np.ndarray = None, mask_out: np.ndarray = None):
+        self.width = width
+        self.height = height
+        self._shifts = 2 * width - 1
+        self.num_actions = ROTATIONS * self._shifts
+        # the arrays can be views into the arrays of a VectorBlockPuzzleEnv
+        self._board_observation = np.zeros((height, width), np.uint8) if board_out is None else board_out
+        self._piece_observation = np.zeros(1, np.uint8) if piece_out is None else piece_out
+        self.action_mask = np.zeros(self.num_actions, bool) if mask_out is None else mask_out
+        self._cells = memoryview(self._board_observation).cast('B')
+        self.observation = {'board': self._board_observation, 'piece': self._piece_observation}
+        self.info = {'score': 0, 'level': 1, 'lines': 0}
+        self.piece_maker = ShapeHelper(random.Random(seed))
+        self.reset(seed)
+
+    # noinspection PyAttributeOutsideInit
+    def reset(self, seed=None) -> typing.Dict[str, np.ndarray]:
+        self.board = FastBoard(self.width, self.height, cells=self._cells)
+        self.piece_maker.reset(seed)
+        self.score = 0
+        self.level = 1
+        self.cleared_lines = 0
+        self._spawn_new_piece()
+        return self.observation
+
+    def step(self, action) -> typing.Tuple[typing.Dict[str, np.ndarray], int, bool, dict]:
+        if self.board.is_game_over():
+            raise RuntimeError("Game is over, reset the environment")
+        rotations, shift = divmod(int(action), self._shifts)
+        cells_dropped = self.board.place(rotations, shift - self.width + 1)
+        if cells_dropped < 0:
+            cells_dropped = self.board.place(0, 0)
+        reward = cells_dropped * rules.SCORE_HARD_DROP
+        full_rows = self.board.clear_completed_rows()
+        reward += self.level * rules.SCORE_LINES[full_rows]
+        self.cleared_lines += full_rows
+        self.level, self.cleared_lines = rules.update_level(self.level, self.cleared_lines)
+        self.score += reward
+        self._spawn_new_piece()
+
+        info = self.info
+        info['score'], info['level'], info['lines'] = self.score, self.level, self.cleared_lines
+        return self.observation, reward, self.board.is_game_over(), info
+
+    def _spawn_new_piece(self):
+        board = self.board
+        board.spawn_piece(self.piece_maker.get_random_shape())
+        self._piece_observation[0] = board.active_shape_code
+        mask = self.action_mask
+        mask.fill(False)
+        if board.is_game_over():
+            return
+        for rotations in range(ROTATIONS):
+            limits = board.get_shift_limits(rotations)
+            if limits is None:
+                break
+            first = rotations * self._shifts + self.width - 1
+            mask[first + limits[0]:first + limits[1] + 1] = True
+
+
+class VectorBlockPuzzleEnv:
+    """
+    Step many environments with one call, an environment that ends its game is
+    reset right away and its done flag is set for that step, the final score of
+    the last game each environment finished is kept in scores.
+    """
+    def __init__(self, num_envs, width=10, height=20, seed=None):
+        self.num_envs = num_envs
+        self.boards = np.zeros((num_envs, height, width), np.uint8)
+        self.pieces = np.zeros(num_envs, np.uint8)
+        self.action_masks = np.zeros((num_envs, ROTATIONS * (2 * width - 1)), bool)
+        self.rewards = np.zeros(num_envs, np.int64)
+        self.dones = np.zeros(num_envs, bool)
+        self.scores = np.zeros(num_envs, np.int64)
+        self.observation = {'board': self.boards, 'piece': self.pieces}
+        self.envs = [BlockPuzzleEnv(width, height,
+                                    board_out=self.boards[i],
+                                    piece_out=self.pieces[i:i + 1],
+                                    mask_out=self.action_masks[i])
+                     for i in range(num_envs)]
+        self.num_actions = self.envs[0].num_actions
+        self.reset(seed)
+
+    def reset(self, seed=None) -> typing.Dict[str, np.ndarray]:
+        for i, env in enumerate(self.envs):
+            env.reset(None if seed is None else seed + i)
+        return self.observation
+
+    def step(self, actions) -> typing.Tuple[typing.Dict[str, np.ndarray], np.ndarray, np.ndarray]:
+        rewards, dones = self.rewards, self.dones
+        for i, env in enumerate(self.envs):
+            _, rewards[i], dones[i], _ = env.step(actions[i])
+            if dones[i]:
+                self.scores[i] = env.score
+                env.reset()
+        return self.observation, rewards, dones
@@ -0,0 +1,246 @@
+"""
+Frame budget benchmark of the whole window.
+
+A BlockPuzzle window (hidden, or headless with PYGLET_HEADLESS=1) runs on a
+VirtualClock, every frame advances the clock by 1/120 s, which fires the
+gravity, the input polling and BlockPuzzle.update (Game.update and
+_redraw_pieces), and then draws the window with on_draw. The input of every
+scenario is scripted and the pieces are seeded, so every run plays the same
+frames.
+
+The CPU time of every frame is split into the update (the timers without
+the redraw), the redraw of the blocks and the draw of the window. The
+allocations are counted by tracemalloc in a second run of the same frames,
+so tracing does not slow down the timed run.
+
+Run ``python -m pyglet_block_puzzle.frame_bench --frames 5000`` for a report.
+"""
+import argparse
+import math
+import random
+import sys
+import time
+import tracemalloc
+import typing
+from dataclasses import dataclass, field
+
+from pyglet.window import key
+
+from pyglet_block_puzzle.clock import VirtualClock
+from pyglet_block_puzzle.main import BLOCK_SIZE, HEIGHT, WIDTH, BlockPuzzle
+from pyglet_block_puzzle.shape import SHAPES, ShapeHelper
+
+FRAME_TIME = 1 / 120.0
+PERCENTILES = (50, 95, 99)
+PHASES = ('update', 'redraw', 'draw')
+
+
+def percentile(values: typing.Sequence[float], p) -> float:
+    """Nearest rank percentile"""
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+@dataclass
+class FrameReport:
+    scenario: str
+    budget: float = FRAME_TIME
+    # CPU seconds of every frame by phase
+    cpu_times: typing.Dict[str, typing.List[float]] = field(default_factory=lambda: {phase: [] for phase in PHASES})
+    allocated_bytes: typing.List[int] = field(default_factory=list)
+
+    @property
+    def frames(self):
+        return len(self.frame_times)
+
+    @property
+    def frame_times(self) -> typing.List[float]:
+        return [sum(times) for times in zip(*self.cpu_times.values())]
+
+    @property
+    def over_budget(self) -> int:
+        return sum(frame_time > self.budget for frame_time in self.frame_times)
+
+    def cpu(self, p, phase=None) -> float:
+        return percentile(self.frame_times if phase is None else self.cpu_times[phase], p)
+
+    def allocated(self, p) -> float:
+        return percentile(self.allocated_bytes, p)
+
+    def __str__(self):
+        def times(phase):
+            return ' '.join(f"p{p} {self.cpu(p, phase) * 1000:.3f}" for p in PERCENTILES)
+        lines = [f"{self.scenario}: {self.frames} frames, {self.over_budget} over the "
+                 f"{self.budget * 1000:.2f} ms budget, ms {times(None)}, allocated bytes "
+                 + ' '.join(f"p{p} {self.allocated(p):,.0f}" for p in PERCENTILES)]
+        lines += [f"    {phase}: ms {times(phase)}" for phase in PHASES]
+        return '\n'.join(lines)
+
+
+def _dispatch(window: BlockPuzzle, *event):
+    # out of pyglet.app.run the window queues its events until they are dispatched
+    window.dispatch_event(*event)
+    window.dispatch_events()
+
+
+def _tap(window: BlockPuzzle, symbol):
+    _dispatch(window, 'on_key_press', symbol, 0)
+    _dispatch(window, 'on_key_release', symbol, 0)
+
+
+class Scenario:
+    """Sets the game up (again after a game over) and plays the input of every frame"""
+    name = None
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def setup(self, window: BlockPuzzle):
+        pass
+
+    def play(self, window: BlockPuzzle, frame):
+        pass
+
+
+class EmptyBoard(Scenario):
+    """No input, the pieces fall on their own"""
+    name = 'empty'
+
+
+class NearFullBoard(Scenario):
+    """The bottom rows are full but for one cell each, pieces are moved and dropped"""
+    name = 'near_full'
+    FREE_ROWS = 6
+
+    def setup(self, window: BlockPuzzle):
+        board = window.game.board
+        for y in range(self.FREE_ROWS, board.height):
+            hole = self.random.randrange(board.width)
+            for x in range(board.width):
+                if x != hole:
+                    board.set_block(x, y, self.random.choice(SHAPES).id)
+
+    def play(self, window: BlockPuzzle, frame):
+        if frame % 30 == 0:
+            window.game.key_handler[key.LEFT] = self.random.random() < 0.3
+            window.game.key_handler[key.RIGHT] = self.random.random() < 0.3
+            _tap(window, key.UP)
+        if frame % 90 == 89:
+            _tap(window, key.SPACE)
+
+
+class SoftDrops(Scenario):
+    """Down is held all the time, every soft drop scores and changes the score label"""
+    name = 'soft_drops'
+
+    def setup(self, window: BlockPuzzle):
+        window.game.key_handler[key.DOWN] = True
+
+    def play(self, window: BlockPuzzle, frame):
+        if frame % 15 == 0:
+            window.game.key_handler[key.LEFT] = self.random.random() < 0.5
+            window.game.key_handler[key.RIGHT] = not window.game.key_handler[key.LEFT]
+
+
+class LevelUps(Scenario):
+    """A level up every half a second, each shows a label that is deleted later"""
+    name = 'level_ups'
+
+    def play(self, window: BlockPuzzle, frame):
+        if frame % 60 == 0:
+            if window.game.level == window.game.MAX_LEVEL:
+                window.game.reset()
+            _tap(window, key.L)
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (EmptyBoard, NearFullBoard, SoftDrops, LevelUps)}
+
+
+class _Timer:
+    """Wraps a method of the game to time it"""
+    def __init__(self, method):
+        self.method = method
+        self.elapsed = 0.0
+
+    def __call__(self, *args, **kwargs):
+        start = time.process_time()
+        try:
+            return self.method(*args, **kwargs)
+        finally:
+            self.elapsed += time.process_time() - start
+
+
+def _run(scenario_type: typing.Type[Scenario], frames, seed, report: FrameReport, trace):
+    clock = VirtualClock()
+    window = BlockPuzzle(WIDTH, HEIGHT, BLOCK_SIZE, clock=clock, visible=False)
+    try:
+        game = window.game
+        game.piece_maker = ShapeHelper(random.Random(seed))
+        game.reset()
+        redraw = game._redraw_pieces = _Timer(game._redraw_pieces)
+        scenario = scenario_type(seed)
+        scenario.setup(window)
+        for frame in range(frames):
+            if game.game_over:
+                game.reset()
+                scenario.setup(window)
+            if trace:
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+            start = time.process_time()
+            redraw.elapsed = 0.0
+            scenario.play(window, frame)
+            clock.advance(FRAME_TIME)
+            drawing = time.process_time()
+            window.switch_to()
+            _dispatch(window, 'on_draw')
+            window.flip()
+            end = time.process_time()
+            if trace:
+                report.allocated_bytes.append(tracemalloc.get_traced_memory()[1] - before)
+            else:
+                report.cpu_times['update'].append(drawing - start - redraw.elapsed)
+                report.cpu_times['redraw'].append(redraw.elapsed)
+                report.cpu_times['draw'].append(end - drawing)
+    finally:
+        clock.unschedule(window.update)
+        clock.unschedule(window.game.fall)
+        clock.unschedule(window.game.move)
+        window.close()
+
+
+def bench_scenario(name, frames=5000, seed=0, budget=FRAME_TIME) -> FrameReport:
+    report = FrameReport(name, budget)
+    _run(SCENARIOS[name], frames, seed, report, trace=False)
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        _run(SCENARIOS[name], frames, seed, report, trace=True)
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return report
+
+
+def bench(frames=5000, scenarios=None, seed=0, budget=FRAME_TIME) -> typing.List[FrameReport]:
+    return [bench_scenario(name, frames, seed, budget) for name in scenarios or SCENARIOS]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames', type=int, default=5000)
+    parser.add_argument('--scenario', action='append', dest='scenarios', choices=tuple(SCENARIOS))
+    parser.add_argument('--budget', type=float, default=FRAME_TIME, help="seconds per frame")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    reports = bench(args.frames, args.scenarios, args.seed, args.budget)
+    for report in reports:
+        print(report)
+    return 1 if any(report.cpu(99) > report.budget for report in reports) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Differential fuzzing of board engines against the reference Board.
+
+Random input sequences are replayed on Board and on every other engine in
+lockstep, the same way Game drives a board: when no piece is active the
+completed rows are cleared and the next piece is spawned, then the input is
+applied. After every step the engines must agree with Board on the blocks,
+the active piece and game over flags, the cleared rows and the values
+returned by the inputs. A failing sequence is shrunk to a minimal repro.
+
+Run ``python -m pyglet_block_puzzle.fuzz`` to check FastBoard.
+"""
+import logging
+import random
+import time
+import typing
+from dataclasses import dataclass, field
+
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.fast_board import FastBoard
+from pyglet_block_puzzle.shape import SHAPES, Shape
+
+_logger = logging.getLogger(__name__)
+
+INPUTS = ('move_left', 'move_right', 'rotate', 'drop', 'full_drop')
+
+EngineFactory = typing.Callable[[int, int], typing.Any]
+
+
+def reference_engine(width, height):
+    return Board(width, height, print_board=False)
+
+
+@dataclass
+class Mismatch:
+    engine: str
+    step: int
+    check: str
+    expected: typing.Any
+    actual: typing.Any
+    inputs: typing.List[str]
+    shapes: typing.List[typing.Type[Shape]]
+
+    def __str__(self):
+        return (f"{self.engine} differs from Board on '{self.check}' at step {self.step}: "
+                f"expected {self.expected!r}, got {self.actual!r}\n"
+                f"inputs: {self.inputs}\n"
+                f"shapes: {[shape.id for shape in self.shapes]}")
+
+
+@dataclass
+class FuzzReport:
+    sequences: int = 0
+    steps: int = 0
+    mismatches: typing.List[Mismatch] = field(default_factory=list)
+    # seconds spent in every engine, the reference included
+    elapsed: typing.Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> typing.Dict[str, float]:
+        """Steps per second of every engine"""
+        return {name: self.steps / seconds for name, seconds in self.elapsed.items() if seconds}
+
+    def __str__(self):
+        lines = [f"{self.sequences} sequences, {self.steps} steps, {len(self.mismatches)} mismatches"]
+        lines += [f"{name}: {steps_per_second:,.0f} steps/s" for name, steps_per_second in self.throughput.items()]
+        lines += [str(mismatch) for mismatch in self.mismatches]
+        return '\n'.join(lines)
+
+
+def _observe(engine, result, cleared):
+    return {
+        'result': result,
+        'cleared': cleared,
+        'get_blocks': engine.get_blocks(),
+        'is_piece_active': engine.is_piece_active(),
+        'is_game_over': engine.is_game_over(),
+    }
+
+
+def _step(engine, shapes, spawned, user_input):
+    """Drive the engine like Game for one input, returns the cleared rows, the input result and the spawn count"""
+    cleared = None
+    if not engine.is_piece_active():
+        cleared = engine.clear_completed_rows()
+        engine.spawn_piece(shapes[spawned % len(shapes)])
+        spawned += 1
+    try:
+        result = getattr(engine, user_input)()
+    except Exception as e:
+        result = type(e).__name__
+    return cleared, result, spawned
+
+
+def run_lockstep(inputs: typing.Sequence[str], shapes: typing.Sequence[typing.Type[Shape]],
+                 engines: typing.Dict[str, EngineFactory], width=10, height=20,
+                 report: FuzzReport = None) -> typing.Optional[Mismatch]:
+    """Replay the inputs on Board and the engines, returns the first mismatch found"""
+    reference = reference_engine(width, height)
+    boards = {name: factory(width, height) for name, factory in engines.items()}
+    spawned = {name: 0 for name in boards}
+    reference_spawned = 0
+    report = report if report is not None else FuzzReport()
+    elapsed = report.elapsed
+    for step, user_input in enumerate(inputs):
+        if reference.is_game_over():
+            break
+        report.steps += 1
+        start = time.perf_counter()
+        cleared, result, reference_spawned = _step(reference, shapes, reference_spawned, user_input)
+        elapsed['Board'] = elapsed.get('Board', 0) + time.perf_counter() - start
+        expected = _observe(reference, result, cleared)
+        for name, board in boards.items():
+            start = time.perf_counter()
+            cleared, result, spawned[name] = _step(board, shapes, spawned[name], user_input)
+            elapsed[name] = elapsed.get(name, 0) + time.perf_counter() - start
+            actual = _observe(board, result, cleared)
+            for check, value in expected.items():
+                if actual[check] != value:
+                    return Mismatch(name, step, check, value, actual[check], list(inputs), list(shapes))
+    return None
+
+
+def shrink(mismatch: Mismatch, engines: typing.Dict[str, EngineFactory], width=10, height=20) -> Mismatch:
+    """Remove inputs and shapes while the engine still fails the same check"""
+    engine = {mismatch.engine: engines[mismatch.engine]}
+
+    def fails(inputs, shapes):
+        found = run_lockstep(inputs, shapes, engine, width, height) if inputs and shapes else None
+        return found if found and found.check == mismatch.check else None
+
+    best = mismatch
+    for attribute in ('inputs', 'shapes'):
+        chunk = len(getattr(best, attribute)) // 2
+        while chunk:
+            start = 0
+            while start < len(getattr(best, attribute)):
+                values = getattr(best, attribute)
+                candidate = values[:start] + values[start + chunk:]
+                found = fails(candidate, best.shapes) if attribute == 'inputs' else fails(best.inputs, candidate)
+                if found:
+                    best = found
+                else:
+                    start += chunk
+            chunk //= 2
+    # inputs after the failing step are never replayed
+    best.inputs = best.inputs[:best.step + 1]
+    return best
+
+
+def fuzz(engines: typing.Dict[str, EngineFactory], sequences=100, length=500, seed=None,
+         width=10, height=20, shrink_mismatches=True) -> FuzzReport:
+    rng = random.Random(seed)
+    report = FuzzReport()
+    for _ in range(sequences):
+        inputs = rng.choices(INPUTS, weights=(3, 3, 2, 4, 1), k=length)
+        shapes = [rng.choice(SHAPES) for _ in range(length)]
+        mismatch = run_lockstep(inputs, shapes, engines, width, height, report)
+        report.sequences += 1
+        if mismatch:
+            _logger.info(f"Found mismatch: {mismatch}")
+            report.mismatches.append(shrink(mismatch, engines, width, height) if shrink_mismatches else mismatch)
+    return report
+
+
+if __name__ == '__main__':
+    print(fuzz({'FastBoard': FastBoard}, seed=0))
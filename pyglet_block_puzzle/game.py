@@ -1,11 +1,15 @@
 import logging
-import time
+import typing
 
 import pyglet
 
 from pyglet.window import key
+from pyglet_block_puzzle import rules
+from pyglet_block_puzzle.autoplay import DecisionWorker
 from pyglet_block_puzzle.block import Block
 from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.rewind import RewindBuffer
+from pyglet_block_puzzle.serialization import GameState
 from pyglet_block_puzzle.shape import ShapeHelper
 
 
@@ -16,14 +20,23 @@ class Game:
 
     MOVE_SPEED_IN_SECONDS = 1 / 200.0
     CONTINUES_MOVE_DELAY_IN_SECONDS = 1 / 20.0
-    SCORE_LINES = {0: 0, 1: 100, 2: 300, 3: 500, 4: 800}
-    SCORE_SOFT_DROP = 1
-    SCORE_HARD_DROP = 2
-    LINES_PER_LEVEL = 10
-    MAX_LEVEL = 20
+    SCORE_LINES = rules.SCORE_LINES
+    SCORE_SOFT_DROP = rules.SCORE_SOFT_DROP
+    SCORE_HARD_DROP = rules.SCORE_HARD_DROP
+    LINES_PER_LEVEL = rules.LINES_PER_LEVEL
+    MAX_LEVEL = rules.MAX_LEVEL
+    MOVE_KEYS = (key.RIGHT, key.D, key.LEFT, key.A, key.DOWN, key.S)
 
-    def __init__(self, width, height, block_size, batch, text_batch, print_to_console=False):
+    def __init__(self, width, height, block_size, batch, text_batch, print_to_console=False, rewind_capacity=0,
+                 clock: pyglet.clock.Clock = None, on_change: typing.Callable[[], None] = None):
         self._print_to_console = print_to_console
+        # every timer of the game runs on this clock, see clock.VirtualClock
+        self.clock = clock or pyglet.clock.get_default()
+        # called when the board changes, for a window that updates only then, the held keys are
+        # then polled only while a move key is down
+        self._on_change = on_change
+        # something drawn changed since the window last drew
+        self.dirty = True
         self.block_size = block_size
         self.width = width
         self.height = height
@@ -32,13 +45,19 @@ class Game:
         self._text_batch = text_batch
         self.key_handler = key.KeyStateHandler()
         self.blocks = []
-        self._latest_move = time.time()
+        self._board_changed = True
+        self._latest_move = self.clock.time()
         self._paused = False
         self._game_paused_text = None
         self._cleared_lines = 0
         self._new_level_text = None
         self._score = 0
         self.game_over = False
+        self.autoplayer = None
+        self._autoplay_inputs = []
+        # states after every piece lock, for rewinding
+        self.rewind_buffer = RewindBuffer(width // block_size, height // block_size, rewind_capacity) \
+            if rewind_capacity else None
         self._score_label = pyglet.text.Label(
             f'Score: {self.score}',
             font_name='Times New Roman',
@@ -53,14 +72,76 @@ class Game:
         elif not self.board.is_piece_active():
             self._score_and_clear_completed_lines()
             self._update_game_level()
+            if self.rewind_buffer is not None:
+                self.rewind_buffer.push(self.get_state())
             self._spawn_new_piece()
+        elif not self._paused:
+            self._play_autoplayer()
 
     def _spawn_new_piece(self):
         tetromino = self.piece_maker.get_random_shape()
         self.board.spawn_piece(tetromino)
         self._reset_clocks()
+        self._request_decision()
+
+    def set_autoplayer(self, autoplayer: typing.Optional[DecisionWorker]):
+        """Let a bot play the pieces, None gives the control back to the keyboard"""
+        if self.autoplayer is not None:
+            self.autoplayer.cancel()
+        self.autoplayer = autoplayer
+        self._autoplay_inputs.clear()
+        self._request_decision()
+
+    def _request_decision(self):
+        self._autoplay_inputs.clear()
+        if self.autoplayer is not None and self.board.is_piece_active() and not self._paused:
+            self.autoplayer.request(self.get_state(), self.piece_maker.preview(self.autoplayer.preview))
+
+    def _cancel_decision(self):
+        if self.autoplayer is not None:
+            self.autoplayer.cancel()
+        self._autoplay_inputs.clear()
+
+    def _play_autoplayer(self):
+        """Play one input of the decision per update, the decision is polled without waiting"""
+        if self.autoplayer is None:
+            return
+        if not self._autoplay_inputs:
+            self._autoplay_inputs = self.autoplayer.poll() or []
+        if self._autoplay_inputs and self.board.is_piece_active():
+            user_input = self._autoplay_inputs.pop(0)
+            if user_input == 'full_drop':
+                self.score += self.board.full_drop() * self.SCORE_HARD_DROP
+            elif user_input == 'rotate' and not self._rotation_fits():
+                # a blocked rotation is retried a row lower, the way apply_placement plays it
+                self._autoplay_inputs.insert(0, user_input)
+                self.board.drop()
+            else:
+                getattr(self.board, user_input)()
+
+    def _rotation_fits(self) -> bool:
+        rotated = self.board.get_active_piece()
+        rotated.rotate()
+        return self.board.fits(rotated)
+
+    def _on_board_event(self, event, data):
+        self._board_changed = True
+        if self._on_change is not None:
+            self._on_change()
+
+    def _set_board(self, board: Board):
+        # noinspection PyAttributeOutsideInit
+        self.board = board
+        self.board.subscribe(self._on_board_event)
+        self._board_changed = True
+        if self._on_change is not None:
+            self._on_change()
 
     def _redraw_pieces(self):
+        if not self._board_changed:
+            return
+        self._board_changed = False
+        self.dirty = True
         self.blocks.clear()
         for (x, y), piece_id in self.board.get_blocks().items():
             x = x * self.block_size
@@ -70,31 +151,66 @@ class Game:
                 Block(block_color, x=x, y=y, width=self.block_size, height=self.block_size, batch=self.batch))
 
     def _unschedule_clocks(self):
-        pyglet.clock.unschedule(self.fall)
+        self.clock.unschedule(self.fall)
+        self.clock.unschedule(self.move)
 
     def _schedule_clocks(self):
-        pyglet.clock.schedule_interval(self.fall, self.gravity)
-        pyglet.clock.schedule_interval(self.move, self.MOVE_SPEED_IN_SECONDS)
+        self.clock.schedule_interval(self.fall, self.gravity)
+        if self._on_change is None or self._is_move_key_held():
+            self.clock.schedule_interval(self.move, self.MOVE_SPEED_IN_SECONDS)
 
     # noinspection PyAttributeOutsideInit
     def reset(self):
-        self.board = Board(self.width // self.block_size,
-                           self.height // self.block_size,
-                           print_board=self._print_to_console)
+        self._cancel_decision()
+        self._set_board(Board(self.width // self.block_size,
+                              self.height // self.block_size,
+                              print_board=self._print_to_console))
         self.blocks.clear()
+        self.dirty = True
         self.piece_maker.reset()
         self._paused = False
         self._toggle_game_paused_text(False)
         self._score = 0
         self._score_label.text = f'Score: 0'
         self._level = 1
-        self._gravity_bps = 0.7  # seconds per block
+        self._gravity_bps = rules.gravity(self._level)
         self.game_over = False
         self._cleared_lines = 0
+        if self.rewind_buffer is not None:
+            self.rewind_buffer.clear()
+            self.rewind_buffer.push(self.get_state())
         self._spawn_new_piece()
         self._unschedule_clocks()
         self._schedule_clocks()
 
+    def get_state(self) -> GameState:
+        return GameState(board=self.board,
+                         bag=self.piece_maker.bag,
+                         score=self._score,
+                         level=self._level,
+                         cleared_lines=self._cleared_lines)
+
+    # noinspection PyAttributeOutsideInit
+    def load_state(self, state: GameState):
+        self._set_board(state.board)
+        self.piece_maker.bag = state.bag
+        self.score = state.score
+        self._level = state.level
+        self._gravity_bps = rules.gravity(state.level)
+        self._cleared_lines = state.cleared_lines
+        self.game_over = state.board.is_game_over()
+        self._reset_clocks()
+        self._request_decision()
+
+    def rewind(self, pieces=1) -> bool:
+        """Go back to the state before the last pieces were locked, False if they are not in the buffer"""
+        if self.rewind_buffer is None or len(self.rewind_buffer) <= pieces:
+            return False
+        _logger.info(f"Rewinding {pieces} pieces")
+        self.load_state(self.rewind_buffer.rewind(pieces))
+        self._spawn_new_piece()
+        return True
+
     @property
     def gravity(self):
         return self._gravity_bps
@@ -111,6 +227,7 @@ class Game:
     def score(self, score):
         self._score = score
         self._score_label.text = f'Score: {self._score}'
+        self.dirty = True
         _logger.info(f"New score: {self._score}")
 
     def pause(self, show_text=True):
@@ -119,11 +236,13 @@ class Game:
             self._paused = True
             self._toggle_game_paused_text(show_text)
             self._unschedule_clocks()
+            self._cancel_decision()
         else:
             _logger.info("Game unpaused")
             self._paused = False
             self._toggle_game_paused_text(False)
-            self._schedule_clocks()
+            self._reset_clocks()
+            self._request_decision()
 
     def is_paused(self):
         return self._paused
@@ -131,12 +250,19 @@ class Game:
     def on_key_press(self, symbol, modifiers):
         if self._paused:
             return
+        if self._on_change is not None and symbol in self.MOVE_KEYS:
+            # the key state handler sees the key after the game, the move polling starts on the next tick
+            self.clock.unschedule(self.move)
+            self.clock.schedule_interval(self.move, self.MOVE_SPEED_IN_SECONDS)
         if symbol == key.UP or symbol == key.W:
             self.board.rotate()
         if symbol == key.SPACE:
             self.score += self.board.full_drop() * self.SCORE_HARD_DROP
 
     def move(self, dt):
+        if self._on_change is not None and not self._is_move_key_held():
+            self.clock.unschedule(self.move)
+            return
         if self._paused or self._is_move_continuous():
             return
         moved = False
@@ -151,10 +277,13 @@ class Game:
                 self.soft_drop()
                 moved = True
         if moved:
-            self._latest_move = time.time()
+            self._latest_move = self.clock.time()
+
+    def _is_move_key_held(self):
+        return any(self.key_handler[symbol] for symbol in self.MOVE_KEYS)
 
     def _is_move_continuous(self):
-        return time.time() - self._latest_move < Game.CONTINUES_MOVE_DELAY_IN_SECONDS
+        return self.clock.time() - self._latest_move < Game.CONTINUES_MOVE_DELAY_IN_SECONDS
 
     def soft_drop(self):
         self._reset_clocks()
@@ -166,7 +295,9 @@ class Game:
 
     def _reset_clocks(self):
         self._unschedule_clocks()
-        self._schedule_clocks()
+        # a paused game schedules them when it is unpaused
+        if not self._paused and not self.game_over:
+            self._schedule_clocks()
 
     def _score_and_clear_completed_lines(self):
         if self.board.any_rows_completed():
@@ -176,6 +307,7 @@ class Game:
             self._cleared_lines += full_rows
 
     def _toggle_game_paused_text(self, toggle):
+        self.dirty = True
         if toggle:
             self._game_paused_text = pyglet.text.Label(
                 f'Paused',
@@ -186,11 +318,12 @@ class Game:
             self._game_paused_text.set_style('background_color', (0, 0, 0, 255))
         elif self._game_paused_text:
             self._game_paused_text.delete()
+            self._game_paused_text = None
 
     def _update_game_level(self):
         if self._cleared_lines >= self.LINES_PER_LEVEL and self._level < self.MAX_LEVEL:
             self._cleared_lines -= self.LINES_PER_LEVEL
-            self._gravity_bps *= 0.8
+            self._gravity_bps *= rules.GRAVITY_FACTOR
             self._level += 1
             new_level_text = pyglet.text.Label(
                 f'Level {self._level}',
@@ -199,7 +332,12 @@ class Game:
                 x=self.width // 2, y=self.height - (self.height // 4), anchor_x='center', anchor_y='center',
                 batch=self._text_batch)
             new_level_text.set_style('background_color', (0, 0, 0, 255))
-            pyglet.clock.schedule_once(lambda dt: new_level_text.delete(), 2)
+            self.dirty = True
+            self.clock.schedule_once(lambda dt: self._delete_label(new_level_text), 2)
+
+    def _delete_label(self, label: pyglet.text.Label):
+        label.delete()
+        self.dirty = True
 
     def level_up(self):
         self._cleared_lines = self.LINES_PER_LEVEL
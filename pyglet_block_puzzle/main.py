@@ -2,6 +2,7 @@ import logging
 
 import pyglet
 
+from pyglet_block_puzzle.autoplay import DecisionWorker
 from pyglet_block_puzzle.game import Game
 
 DEBUG = False
@@ -13,40 +14,81 @@ _logger.setLevel(logging.DEBUG if DEBUG else logging.ERROR)
 WIDTH = 250
 HEIGHT = 500
 BLOCK_SIZE = WIDTH // 10
+REWIND_CAPACITY = 1000
 
 
 class BlockPuzzle(pyglet.window.Window):
-    def __init__(self, width, height, block_size):
+    """
+    With idle_aware the window sleeps between changes: the game is updated
+    right after the board changes (a gravity step or an input) instead of at
+    a fixed rate, the held keys are polled only while a move key is down, no
+    timer runs while the game is paused or over, and frames where nothing
+    drawn changed are neither drawn nor flipped.
+    """
+    UPDATE_INTERVAL = 1 / 120.0
+    # the last frame stays on screen when a frame is skipped
+    _frame_drawn = True
+
+    def __init__(self, width, height, block_size, clock: pyglet.clock.Clock = None, idle_aware=False, **kwargs):
         super().__init__(
             caption='Block Puzzle',
             width=width,
             height=height,
             fullscreen=False,
-            resizable=False
+            resizable=False,
+            **kwargs
         )
+        self.clock = clock or pyglet.clock.get_default()
+        self.idle_aware = idle_aware
         self.main_batch = pyglet.graphics.Batch()
         self.text_batch = pyglet.graphics.Batch()
         self.game = Game(width, height, block_size,
                          self.main_batch,
                          self.text_batch,
-                         print_to_console=DEBUG)
+                         print_to_console=DEBUG,
+                         rewind_capacity=REWIND_CAPACITY,
+                         clock=self.clock,
+                         on_change=self.wake if idle_aware else None)
         self.push_handlers(self.game.key_handler)
         self.push_handlers(self.game)
-        pyglet.clock.schedule_interval(self.update, 1 / 120.0)
+        if idle_aware:
+            self.wake()
+        else:
+            self.clock.schedule_interval(self.update, self.UPDATE_INTERVAL)
+
+    def wake(self):
+        """Update on the next tick, when idle_aware"""
+        self.clock.unschedule(self.update)
+        self.clock.schedule_once(self.update, 0)
 
     def update(self, dt):
+        if not self.game.game_over:
+            self.game.update(dt)
         if self.game.game_over:
             if not self.game.is_paused():
                 self.game.pause(show_text=False)
                 print('Game Over!')
-        else:
-            self.game.update(dt)
+        elif self.idle_aware and self.game.autoplayer is not None and not self.game.is_paused():
+            # the decision is polled until it comes
+            self.clock.unschedule(self.update)
+            self.clock.schedule_once(self.update, self.UPDATE_INTERVAL)
 
     def on_draw(self):
+        self._frame_drawn = not self.idle_aware or self.game.dirty
+        if not self._frame_drawn:
+            return
+        self.game.dirty = False
         self.clear()
         self.main_batch.draw()
         self.text_batch.draw()
 
+    def flip(self):
+        if self._frame_drawn:
+            super().flip()
+
+    def on_expose(self):
+        self.game.dirty = True
+
     def on_key_press(self, symbol, modifiers):
         super().on_key_press(symbol, modifiers)
         if symbol == pyglet.window.key.R:
@@ -55,8 +97,23 @@ class BlockPuzzle(pyglet.window.Window):
             self.game.pause()
         if symbol == pyglet.window.key.L:
             self.game.level_up()
+        if symbol == pyglet.window.key.U:
+            self.game.rewind()
+        if symbol == pyglet.window.key.B:
+            self.toggle_autoplay()
+        if self.idle_aware:
+            self.wake()
+
+    def toggle_autoplay(self):
+        autoplayer = self.game.autoplayer
+        if autoplayer:
+            self.game.set_autoplayer(None)
+            autoplayer.close()
+        else:
+            # in a process, a search in a thread would hold the GIL and stall the frames
+            self.game.set_autoplayer(DecisionWorker(use_process=True))
 
 
 if __name__ == '__main__':
-    game = BlockPuzzle(WIDTH, HEIGHT, BLOCK_SIZE)
+    game = BlockPuzzle(WIDTH, HEIGHT, BLOCK_SIZE, idle_aware=True)
     pyglet.app.run()
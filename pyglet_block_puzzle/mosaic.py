@@ -0,0 +1,288 @@
+"""
+Many boards watched live in one window.
+
+Every board is a tile of a grid drawn from a single Batch. A tile is one
+vertex list with a quad per cell, the positions never change and only the
+colors of the cells that changed are written, so an idle board costs
+nothing. Tiles listen to the events of their board and are refreshed only
+when it published a change.
+
+Tiles scrolled out of the window give their vertex list back and are
+painted whole when they come back, nothing is refreshed while the window is
+minimized, and only the focused tile is refreshed on every update, the rest
+every unfocused_interval seconds.
+
+Run ``python -m pyglet_block_puzzle.mosaic --boards 256`` to watch bots play.
+"""
+import argparse
+import random
+import typing
+
+import pyglet
+from pyglet import gl
+
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.events import BoardEvent
+from pyglet_block_puzzle.shape import SHAPES
+from pyglet_block_puzzle.simulation import HeadlessGame
+
+EMPTY_COLOR = (24, 24, 24)
+_COLORS = {shape.id: shape.color.value for shape in SHAPES}
+
+
+class _ScrollGroup(pyglet.graphics.Group):
+    """Tiles are laid out down from y=0, the group moves them into the window"""
+    def __init__(self):
+        super().__init__()
+        self.offset = (0, 0)
+
+    def set_state(self):
+        gl.glPushMatrix()
+        gl.glTranslatef(self.offset[0], self.offset[1], 0)
+
+    def unset_state(self):
+        gl.glPopMatrix()
+
+
+class _Tile:
+    def __init__(self, game, left, top, cell_size):
+        # anything with a board attribute, a new board (after a reset) is picked up on refresh
+        self.game = game
+        self.left = left
+        self.top = top
+        self.cell_size = cell_size
+        self.board: typing.Optional[Board] = None
+        self.vertex_list = None
+        self._changed_cells = set()
+        self._repaint = True
+
+    def _on_board_event(self, event: BoardEvent, data):
+        if self.vertex_list is None:
+            return
+        if event == BoardEvent.CELLS_CHANGED:
+            self._changed_cells.update(data)
+        elif event in (BoardEvent.ROWS_CLEARED, BoardEvent.ROWS_SHIFTED):
+            self._repaint = True
+
+    def _watch(self, board: Board):
+        if self.board is not None:
+            self.board.unsubscribe(self._on_board_event)
+        self.board = board
+        board.subscribe(self._on_board_event)
+        self._repaint = True
+
+    def show(self, batch, group):
+        board = self.game.board
+        size = self.cell_size
+        positions = []
+        for y in range(board.height):
+            top = self.top - y * size
+            for x in range(board.width):
+                left = self.left + x * size
+                positions += (left, top - size, left + size, top - size, left + size, top, left, top)
+        self.vertex_list = batch.add(len(positions) // 2, gl.GL_QUADS, group,
+                                     ('v2f/static', positions), ('c3B/stream', EMPTY_COLOR * (len(positions) // 2)))
+        self._repaint = True
+
+    def hide(self):
+        if self.vertex_list is not None:
+            self.vertex_list.delete()
+            self.vertex_list = None
+        self._changed_cells.clear()
+
+    def close(self):
+        self.hide()
+        if self.board is not None:
+            self.board.unsubscribe(self._on_board_event)
+            self.board = None
+
+    def is_dirty(self) -> bool:
+        return self.game.board is not self.board or self._repaint or bool(self._changed_cells)
+
+    def refresh(self) -> bool:
+        """Write the colors of the changed cells, False when nothing changed"""
+        if self.game.board is not self.board:
+            self._watch(self.game.board)
+        if not self._repaint and not self._changed_cells:
+            return False
+        board = self.board
+        colors = self.vertex_list.colors
+        if self._repaint:
+            colors[:] = [component for y in range(board.height) for x in range(board.width)
+                         for component in _COLORS.get(board.get_block(x, y), EMPTY_COLOR) * 4]
+        else:
+            for x, y in self._changed_cells:
+                index = (y * board.width + x) * 12
+                colors[index:index + 12] = _COLORS.get(board.get_block(x, y), EMPTY_COLOR) * 4
+        self._repaint = False
+        self._changed_cells.clear()
+        return True
+
+
+class Mosaic:
+    def __init__(self, columns, board_width=10, board_height=20, cell_size=4, spacing=4,
+                 batch: pyglet.graphics.Batch = None, unfocused_interval=0.25):
+        self.columns = columns
+        self.board_width = board_width
+        self.board_height = board_height
+        self.cell_size = cell_size
+        self.spacing = spacing
+        self.batch = batch or pyglet.graphics.Batch()
+        self.unfocused_interval = unfocused_interval
+        self.tiles: typing.List[_Tile] = []
+        self.focused: typing.Optional[int] = None
+        self.minimized = False
+        self.view_width = 0
+        self.view_height = 0
+        self.scroll = 0
+        self._group = _ScrollGroup()
+        self._since_refresh = 0.0
+
+    @property
+    def tile_width(self):
+        return self.board_width * self.cell_size + self.spacing
+
+    @property
+    def tile_height(self):
+        return self.board_height * self.cell_size + self.spacing
+
+    @property
+    def rows(self):
+        return -(-len(self.tiles) // self.columns)
+
+    def add(self, game) -> int:
+        """Watch the board of a game, returns the index of its tile"""
+        index = len(self.tiles)
+        row, column = divmod(index, self.columns)
+        tile = _Tile(game, column * self.tile_width + self.spacing, -row * self.tile_height - self.spacing,
+                     self.cell_size)
+        self.tiles.append(tile)
+        if self._is_visible(index):
+            tile.show(self.batch, self._group)
+        return index
+
+    def close(self):
+        for tile in self.tiles:
+            tile.close()
+        self.tiles.clear()
+
+    def set_view(self, width, height):
+        self.view_width = width
+        self.view_height = height
+        self.scroll_to(self.scroll)
+
+    def scroll_to(self, scroll):
+        """Scroll down the rows of tiles by pixels, tiles that leave or enter the view are hidden or shown"""
+        self.scroll = max(0, min(scroll, self.rows * self.tile_height - self.view_height))
+        self._group.offset = (0, self.view_height + self.scroll)
+        for index, tile in enumerate(self.tiles):
+            visible = self._is_visible(index)
+            if visible and tile.vertex_list is None:
+                tile.show(self.batch, self._group)
+            elif not visible and tile.vertex_list is not None:
+                tile.hide()
+
+    def _is_visible(self, index) -> bool:
+        row = index // self.columns
+        top = row * self.tile_height
+        return top < self.scroll + self.view_height and top + self.tile_height > self.scroll
+
+    def tile_at(self, x, y) -> typing.Optional[int]:
+        """The index of the tile at a point of the window"""
+        column = int(x // self.tile_width)
+        row = int((self.view_height + self.scroll - y) // self.tile_height)
+        index = row * self.columns + column
+        if 0 <= column < self.columns and 0 <= row and index < len(self.tiles):
+            return index
+        return None
+
+    def update(self, dt) -> int:
+        """Refresh the tiles that are due, returns the number of tiles that changed"""
+        self._since_refresh += dt
+        if self.minimized:
+            return 0
+        refreshed = 0
+        if self._since_refresh >= self.unfocused_interval:
+            self._since_refresh = 0.0
+            for tile in self.tiles:
+                if tile.vertex_list is not None:
+                    refreshed += tile.refresh()
+        elif self.focused is not None and self.tiles[self.focused].vertex_list is not None:
+            refreshed += self.tiles[self.focused].refresh()
+        return refreshed
+
+    def is_dirty(self) -> bool:
+        return any(tile.vertex_list is not None and tile.is_dirty() for tile in self.tiles)
+
+
+class MosaicWindow(pyglet.window.Window):
+    """Scroll with the mouse wheel, click a board to focus it"""
+    MAX_HEIGHT = 800
+
+    def __init__(self, mosaic: Mosaic, rows, **kwargs):
+        super().__init__(caption='Block Puzzle Mosaic',
+                         width=mosaic.columns * mosaic.tile_width + mosaic.spacing,
+                         height=min(rows * mosaic.tile_height + mosaic.spacing, self.MAX_HEIGHT),
+                         **kwargs)
+        self.mosaic = mosaic
+        pyglet.clock.schedule_interval(self.update, 1 / 60.0)
+
+    def update(self, dt):
+        self.mosaic.update(dt)
+
+    def on_draw(self):
+        self.clear()
+        self.mosaic.batch.draw()
+
+    def on_resize(self, width, height):
+        super().on_resize(width, height)
+        self.mosaic.set_view(width, height)
+
+    def on_mouse_scroll(self, x, y, scroll_x, scroll_y):
+        self.mosaic.scroll_to(self.mosaic.scroll - scroll_y * self.mosaic.tile_height)
+
+    def on_mouse_press(self, x, y, button, modifiers):
+        self.mosaic.focused = self.mosaic.tile_at(x, y)
+
+    def on_hide(self):
+        self.mosaic.minimized = True
+
+    def on_show(self):
+        self.mosaic.minimized = False
+
+    def on_close(self):
+        pyglet.clock.unschedule(self.update)
+        self.mosaic.close()
+        super().on_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch bots play random placements on many boards")
+    parser.add_argument('--boards', type=int, default=256)
+    parser.add_argument('--columns', type=int, default=16)
+    parser.add_argument('--cell-size', type=int, default=4)
+    parser.add_argument('--placements-per-second', type=float, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    games = [HeadlessGame(seed=rng.randrange(2 ** 32)) for _ in range(args.boards)]
+    mosaic = Mosaic(args.columns, cell_size=args.cell_size)
+    for game in games:
+        mosaic.add(game)
+    MosaicWindow(mosaic, mosaic.rows)
+
+    def play(dt):
+        for game in games:
+            if rng.random() < dt * args.placements_per_second:
+                if game.is_game_over():
+                    game.reset()
+                else:
+                    game.step(rng.choice(game.get_placements()))
+
+    pyglet.clock.schedule_interval(play, 1 / 60.0)
+    pyglet.app.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+Book of the best placements for a surface profile and a piece.
+
+The surface profile of a board is the height difference of every pair of
+neighbouring columns, clamped to [-clamp, clamp]. The book is built offline
+by trying every placement of every piece on a board made of solid columns
+for every profile, and keeps the best placements of each.
+
+Entries are stored in an open addressing hash table of fixed-size slots
+that is memory-mapped, a lookup hashes the key and reads one slot (or a few
+next to it), so it touches a single page most of the time. Placements are
+relative to the piece at its spawn position.
+
+Run ``python -m pyglet_block_puzzle.opening_book book.bin`` to build a book.
+"""
+import argparse
+import itertools
+import logging
+import mmap
+import multiprocessing
+import os
+import struct
+import typing
+import zlib
+
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.fast_board import FastBoard
+from pyglet_block_puzzle.board.placement import Placement
+from pyglet_block_puzzle.autoplay import SearchDecider
+from pyglet_block_puzzle.search import WEIGHTS, Cancelled, children, evaluate
+from pyglet_block_puzzle.shape import SHAPES, SHAPE_CODES, Shape
+
+_logger = logging.getLogger(__name__)
+
+_MAGIC = b'BPOB'
+_VERSION = 1
+# magic, version, board width, board height, clamp, placements per entry, slots
+_HEADER = struct.Struct('<4sBBBBBI')
+_PLACEMENT = struct.Struct('<Bb')
+# rows above the surface kept free for the piece to spawn and rotate
+SPAWN_ROWS = 4
+
+
+def column_heights(board: Board) -> typing.List[int]:
+    """Height of the highest settled cell of every column, the active piece is not counted"""
+    piece = board.get_active_piece()
+    own_cells = {(block.x, block.y) for block in piece} if piece else set()
+    heights = [0] * board.width
+    for (x, y), _ in board.get_blocks().items():
+        if (x, y) not in own_cells:
+            heights[x] = max(heights[x], board.height - y)
+    return heights
+
+
+def surface_profile(heights: typing.Sequence[int], clamp) -> typing.Tuple[int, ...]:
+    return tuple(max(-clamp, min(clamp, b - a)) for a, b in zip(heights, heights[1:]))
+
+
+def profile_heights(profile: typing.Sequence[int]) -> typing.List[int]:
+    """The lowest column heights with the profile"""
+    heights = [0] + list(itertools.accumulate(profile))
+    lowest = min(heights)
+    return [height - lowest for height in heights]
+
+
+def _key(profile: typing.Sequence[int], shape: typing.Type[Shape], clamp) -> bytes:
+    return bytes(difference + clamp for difference in profile) + bytes((SHAPE_CODES[shape.id],))
+
+
+def best_placements(profile: typing.Sequence[int], shape: typing.Type[Shape], height, best=3) -> typing.List[Placement]:
+    """Try every placement of the shape on solid columns with the profile, the best first"""
+    heights = profile_heights(profile)
+    board = FastBoard(len(heights), height)
+    cells = bytearray(len(heights) * height)
+    for x, column_height in enumerate(heights):
+        for y in range(height - column_height, height):
+            cells[y * len(heights) + x] = SHAPE_CODES[shape.id]
+    board.load(cells)
+    scored = [(WEIGHTS[0] * lines + evaluate(child), -index, placement)
+              for index, (placement, child, lines) in enumerate(children(board, shape))]
+    return [placement for _, _, placement in sorted(scored, reverse=True)[:best]]
+
+
+def _entries(args) -> typing.List[typing.Tuple[bytes, typing.List[Placement]]]:
+    profiles, width, height, clamp, best = args
+    entries = []
+    for profile in profiles:
+        for shape in SHAPES:
+            entries.append((_key(profile, shape, clamp), best_placements(profile, shape, height, best)))
+    return entries
+
+
+def _profiles(width, height, clamp) -> typing.Iterator[typing.Tuple[int, ...]]:
+    for profile in itertools.product(range(-clamp, clamp + 1), repeat=width - 1):
+        # solid columns that reach the spawn rows can not be searched
+        if max(profile_heights(profile)) <= height - SPAWN_ROWS:
+            yield profile
+
+
+def _insert(table, slots, slot_size, key: bytes, placements: typing.List[Placement]):
+    key_size = len(key)
+    slot = zlib.crc32(key) & (slots - 1)
+    while table[_HEADER.size + slot * slot_size + key_size - 1]:
+        slot = (slot + 1) & (slots - 1)
+    offset = _HEADER.size + slot * slot_size
+    table[offset:offset + key_size] = key
+    table[offset + key_size] = len(placements)
+    for i, placement in enumerate(placements):
+        _PLACEMENT.pack_into(table, offset + key_size + 1 + i * _PLACEMENT.size,
+                             placement.rotations, placement.shift)
+
+
+def build_book(path, width=10, height=20, clamp=2, best=3, workers=1, chunk_size=256) -> int:
+    """Search every profile and piece and write the book, returns the number of entries"""
+    # the table is sized up front and the entries go straight into the mapped file, they
+    # never are all in memory at once
+    entries = sum(1 for _ in _profiles(width, height, clamp)) * len(SHAPES)
+    slot_size = width + 1 + best * _PLACEMENT.size
+    slots = 1
+    # at most half full, so probes stay short
+    while slots < 2 * entries:
+        slots *= 2
+    with open(path, 'w+b') as book:
+        book.write(_HEADER.pack(_MAGIC, _VERSION, width, height, clamp, best, slots))
+        book.truncate(_HEADER.size + slots * slot_size)
+        with mmap.mmap(book.fileno(), 0) as table:
+            profiles = _profiles(width, height, clamp)
+            chunks = ((chunk, width, height, clamp, best)
+                      for chunk in iter(lambda: list(itertools.islice(profiles, chunk_size)), []))
+            pool = multiprocessing.Pool(workers) if workers > 1 else None
+            try:
+                for chunk in pool.imap(_entries, chunks) if pool else map(_entries, chunks):
+                    for key, placements in chunk:
+                        _insert(table, slots, slot_size, key, placements)
+            finally:
+                if pool is not None:
+                    pool.terminate()
+    _logger.info(f"Wrote {entries} entries to {path}")
+    return entries
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        magic, version, self.width, self.height, self.clamp, self.best, self._slots = \
+            _HEADER.unpack(self._file.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"{path} is not an opening book")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._key_size = self.width
+        self._slot_size = self._key_size + 1 + self.best * _PLACEMENT.size
+
+    def lookup_profile(self, profile: typing.Sequence[int], shape: typing.Type[Shape]) -> typing.List[Placement]:
+        key = _key(profile, shape, self.clamp)
+        slot = zlib.crc32(key) & (self._slots - 1)
+        book, key_size, slot_size = self._map, self._key_size, self._slot_size
+        while True:
+            offset = _HEADER.size + slot * slot_size
+            if not book[offset + key_size - 1]:
+                return []
+            if book[offset:offset + key_size] == key:
+                return [Placement(*_PLACEMENT.unpack_from(book, offset + key_size + 1 + i * _PLACEMENT.size))
+                        for i in range(book[offset + key_size])]
+            slot = (slot + 1) & (self._slots - 1)
+
+    def lookup(self, board: Board) -> typing.List[Placement]:
+        """
+        The best placements of the active piece of a board, empty on a miss.
+        The piece must be where it spawned and the spawn rows free, like on the
+        boards the book was built on, so every placement can be reached.
+        """
+        piece = board.get_active_piece()
+        if not piece or (board.width, board.height) != (self.width, self.height):
+            return []
+        spawn = board.spawn_position
+        if {(block.x, block.y) for block in piece} != {(x + spawn.x, y + spawn.y) for x, y in piece.shape.cords}:
+            return []
+        heights = column_heights(board)
+        if max(heights) > self.height - SPAWN_ROWS:
+            return []
+        return self.lookup_profile(surface_profile(heights, self.clamp), piece.shape)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getstate__(self):
+        # the map is opened again where the book is unpickled, like in a decision subprocess
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+
+class BookDecider:
+    """Take the placement from the book, search for it on a miss"""
+    def __init__(self, book: OpeningBook, fallback=None):
+        self.book = book
+        self.fallback = fallback or SearchDecider()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, board: Board, preview: typing.List[typing.Type[Shape]],
+                 cancelled: Cancelled = None) -> typing.Optional[Placement]:
+        placements = self.book.lookup(board)
+        if placements:
+            self.hits += 1
+            return placements[0]
+        self.misses += 1
+        return self.fallback(board, preview, cancelled)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build an opening book")
+    parser.add_argument('path')
+    parser.add_argument('--width', type=int, default=10)
+    parser.add_argument('--height', type=int, default=20)
+    parser.add_argument('--clamp', type=int, default=2)
+    parser.add_argument('--best', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+    print(build_book(args.path, args.width, args.height, args.clamp, args.best, args.workers))
+
+
+if __name__ == '__main__':
+    main()
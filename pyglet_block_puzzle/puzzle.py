@@ -0,0 +1,456 @@
+"""
+Perfect clear puzzles: a starting board and a fixed sequence of pieces, solved
+when every piece is placed and the board is empty after the last one.
+
+The solver searches depth first over the placements the game can play, a
+rotation and a shift and then a hard drop. The rows to clear never reach the
+spawn rows, so every placement of a shape is reachable on every board of the
+search, they are found once on an empty board.
+
+The search works on the rows to clear as they are at the start, cleared rows
+stay where they were and are full. A piece that lands on rows with cleared
+rows between them covers rows of the start that are apart, so every way the
+pieces can end up is a tiling of the empty cells of the start with tiles
+that may skip rows: a tile is the cells of a landed piece spread over rows
+in the same order. The tilings are found before the search, lowest empty
+cell first, and they decide what the search tries:
+
+- a placement is only tried if its tile is in a tiling with every tile
+  placed before it, two tiles are checked against each other once, before
+  the search;
+- a board is cut off when one of its empty cells is not in any tile that
+  can still be placed;
+- a board that can not be cleared is remembered by its cells alone, the
+  cells of the start and the pieces placed tell how many pieces were.
+
+Puzzles of a few rows have some ten thousand partial tilings, found in a
+fraction of a second. Bigger ones can have too many, then the tilings are
+given up and tiles only have to keep clear of each other.
+
+Most puzzles are solved without ever covering an empty cell, so boards with
+covered cells are left out of a first search, and a second one searches
+them all to find the rest of the solutions or prove there is none. With
+workers the placements of the first piece of the second search are split
+across a pool of processes, the first solution found stops the pool.
+
+A timeout stops the search and leaves the result incomplete: the answer is
+unknown.
+"""
+import functools
+import itertools
+import logging
+import multiprocessing
+import time
+import typing
+from dataclasses import dataclass
+
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.fast_board import FastBoard
+from pyglet_block_puzzle.board.placement import Placement
+from pyglet_block_puzzle.search import ROTATIONS
+from pyglet_block_puzzle.shape import SHAPES, Shape
+
+_logger = logging.getLogger(__name__)
+
+CELLS_PER_PIECE = 4
+# rows above the rows to clear kept free for the pieces to spawn and rotate
+SPAWN_ROWS = 4
+# partial tilings searched between two looks at the clock, and at most
+_DEADLINE_CHECKS = 1024
+_MAX_TILINGS = 1 << 19
+
+# rows of the cells of a landed piece from its lowest row up
+_Drop = typing.Tuple[Placement, typing.Tuple[int, ...]]
+
+
+@dataclass
+class Puzzle:
+    board: Board
+    pieces: typing.List[typing.Type[Shape]]
+
+
+@dataclass
+class SolveResult:
+    # None when there are no placements that clear the board, or when the search did not complete
+    placements: typing.Optional[typing.List[Placement]]
+    # False when the deadline passed before a solution was found or every board was searched
+    complete: bool
+    searched: int
+
+
+def _settled_rows(board: Board) -> typing.Tuple[int, ...]:
+    """Row bitmasks of the settled cells from the bottom up, without the empty rows on top"""
+    piece = board.get_active_piece()
+    own_cells = {(block.x, block.y) for block in piece} if piece else set()
+    rows = [0] * board.height
+    for x, y in board.get_blocks():
+        if (x, y) not in own_cells:
+            rows[board.height - 1 - y] |= 1 << x
+    while rows and not rows[-1]:
+        rows.pop()
+    return tuple(rows)
+
+
+@functools.lru_cache(maxsize=None)
+def _drops(shape: typing.Type[Shape], width, height) -> typing.List[_Drop]:
+    """Every placement of a shape that lands its cells differently, found on an empty board"""
+    board = FastBoard(width, height)
+    board.spawn_piece(shape)
+    drops = {}
+    for rotations in range(ROTATIONS):
+        limits = board.get_shift_limits(rotations)
+        if limits is None:
+            break
+        for shift in range(limits[0], limits[1] + 1):
+            child = board.copy()
+            if child.place(rotations, shift) < 0:
+                continue
+            cells = tuple(row for row in reversed(child.rows) if row)
+            drops.setdefault(cells, (Placement(rotations, shift), cells))
+    return list(drops.values())
+
+
+def _kinds(shapes) -> typing.Tuple[typing.Type[Shape], ...]:
+    return tuple(sorted(set(shapes), key=SHAPES.index))
+
+
+def _bits(cells: int) -> typing.Iterator[int]:
+    while cells:
+        cell = cells & -cells
+        yield cell.bit_length() - 1
+        cells ^= cell
+
+
+class _DeadlinePassed(Exception):
+    pass
+
+
+class _Tile(typing.NamedTuple):
+    kind: int
+    placement: Placement
+    cells: int
+    # rows of the start between the rows of the tile, they have to be cleared before it lands
+    skipped: int
+    # cells over the tile that have to be empty for it to drop there, and the cells under it
+    above: int
+    below: int
+
+
+class _Tiling:
+    """
+    The tiles of the pieces on the rows to clear of the start, and which of
+    them are in a tiling together. Cells are bits column by column, cell
+    (x, y) is bit x * rows + y, so filling the lowest empty cell first goes up
+    a column before the next one and partial tilings that differ only in the
+    columns behind are the same. Counts of pieces are packed in an int, a
+    field of bits per kind.
+
+    Tilings that take past give_up or are too many to keep are given up.
+    """
+    def __init__(self, width, height, start: typing.Tuple[int, ...], pieces: typing.Sequence[typing.Type[Shape]],
+                 rows, give_up=None):
+        self.width = width
+        self.rows = rows
+        self.full = (1 << width * rows) - 1
+        self.column = (1 << rows) - 1
+        self.row_cells = [sum(1 << x * rows + y for x in range(width)) for y in range(rows)]
+        self.start = self.cells(start, range(rows))
+        kinds = _kinds(pieces)
+        self.kinds = [kinds.index(shape) for shape in pieces]
+        self.tiles = [tile for kind, shape in enumerate(kinds)
+                      for tile in self._tiles(kind, _drops(shape, width, height))]
+        self.kind_tiles = [0] * len(kinds)
+        self.cell_tiles = [0] * (width * rows)
+        for i, tile in enumerate(self.tiles):
+            self.kind_tiles[tile.kind] |= 1 << i
+            for cell in _bits(tile.cells):
+                self.cell_tiles[cell] |= 1 << i
+        counts = [tuple(pieces[index:].count(shape) for shape in kinds) for index in range(len(pieces) + 1)]
+        # tiles of the kinds left from every index
+        self.left = [sum(tiles for tiles, count in zip(self.kind_tiles, index_counts) if count)
+                     for index_counts in counts]
+        tilings = self._tilings(counts, give_up)
+        if tilings is None:
+            _logger.debug(f"Gave up on the tilings of {len(pieces)} pieces")
+            self.usable = sum(1 << i for i, tile in enumerate(self.tiles) if not tile.cells & self.start)
+            self.together = [self.usable & ~functools.reduce(int.__or__, map(self.cell_tiles.__getitem__,
+                                                                            _bits(tile.cells)))
+                             for tile in self.tiles]
+        else:
+            # the tiles in any tiling and the tiles in a tiling with each tile
+            self.usable, self.together = tilings
+        self._supports = {}
+
+    def cells(self, rows: typing.Sequence[int], start_rows: typing.Iterable[int]) -> int:
+        cells = 0
+        for row, y in zip(rows, start_rows):
+            for x in range(self.width):
+                if row >> x & 1:
+                    cells |= 1 << x * self.rows + y
+        return cells
+
+    def _tiles(self, kind, drops: typing.List[_Drop]) -> typing.Iterator[_Tile]:
+        for placement, rows in drops:
+            for start_rows in itertools.combinations(range(self.rows), len(rows)):
+                cells = self.cells(rows, start_rows)
+                skipped = sum(1 << y for y in range(start_rows[0], start_rows[-1]) if y not in start_rows)
+                above = below = 0
+                for x in range(self.width):
+                    column = cells >> x * self.rows & self.column
+                    if column:
+                        top = column.bit_length()
+                        bottom = (column & -column).bit_length() - 1
+                        above |= (self.column >> top << top) << x * self.rows
+                        below |= ((1 << bottom) - 1) << x * self.rows
+                yield _Tile(kind, placement, cells, skipped, above, below)
+
+    def _tilings(self, counts: typing.List[typing.Tuple[int, ...]], give_up=None) \
+            -> typing.Optional[typing.Tuple[int, typing.List[int]]]:
+        """Find every tiling of the start, None when there are too many or it takes past give_up"""
+        full = self.full
+        shift = self.width * self.rows
+        count_bits = len(counts).bit_length()
+        count_mask = (1 << count_bits) - 1
+        by_lowest = [[] for _ in range(self.width * self.rows)]
+        for i, tile in enumerate(self.tiles):
+            by_lowest[(tile.cells & -tile.cells).bit_length() - 1].append((i, tile.kind * count_bits, tile.cells))
+        # the tiles out of every partial tiling that lead to a full one, a partial tiling comes after
+        # the ones it leads to
+        edges = {}
+        tileable = {}
+
+        def tile(filled, left):
+            if filled == full:
+                return True
+            key = filled | left << shift
+            result = tileable.get(key)
+            if result is not None:
+                return result
+            if len(tileable) == _MAX_TILINGS or give_up is not None and \
+                    not len(tileable) % _DEADLINE_CHECKS and time.time() > give_up:
+                raise _DeadlinePassed()
+            free = ~filled & full
+            lowest = (free & -free).bit_length() - 1
+            out = []
+            for i, kind, cells in by_lowest[lowest]:
+                if left >> kind & count_mask and not cells & filled and tile(filled | cells, left - (1 << kind)):
+                    out.append((i, filled | cells | left - (1 << kind) << shift))
+            if out:
+                edges[key] = out
+            tileable[key] = bool(out)
+            return bool(out)
+
+        packed = [sum(count << kind * count_bits for kind, count in enumerate(index_counts))
+                  for index_counts in counts]
+        try:
+            if not tile(self.start, packed[0]):
+                return 0, []
+        except _DeadlinePassed:
+            return None
+        # tiles on the way from every partial tiling to a full one
+        after = {full | packed[-1] << shift: 0}
+        for key, out in edges.items():
+            after[key] = functools.reduce(int.__or__, (1 << i | after[child] for i, child in out))
+        start = self.start | packed[0] << shift
+        before = {start: 0}
+        together = [0] * len(self.tiles)
+        for key, out in reversed(edges.items()):
+            for i, child in out:
+                way = before[key] | 1 << i
+                together[i] |= way | after[child]
+                before[child] = before.get(child, 0) | way
+        return after[start], together
+
+    def supports(self, tile: int, cleared: int) -> int:
+        """The cells right under the tile once the cleared rows are gone, -1 when it is on the floor"""
+        key = (tile, cleared)
+        supports = self._supports.get(key)
+        if supports is None:
+            supports = 0
+            cells = self.tiles[tile].cells
+            for x in range(self.width):
+                column = cells >> x * self.rows & self.column
+                if column:
+                    y = (column & -column).bit_length() - 2
+                    while y >= 0 and cleared >> y & 1:
+                        y -= 1
+                    if y < 0:
+                        supports = -1
+                        break
+                    supports |= 1 << x * self.rows + y
+            self._supports[key] = supports
+        return supports
+
+
+class _Solver:
+    def __init__(self, tiling: _Tiling, covered_cells=True, deadline=None):
+        self.tiling = tiling
+        self.covered_cells = covered_cells
+        self.deadline = deadline
+        self._failed = set()
+        self.nodes = 0
+
+    def children(self, filled, cleared, allowed, index) -> typing.List[typing.Tuple[int, int, int, int, int]]:
+        """
+        The tiles the piece at index can drop on that leave a board that can
+        still be cleared, with the cells filled, the rows cleared, the tiles
+        still allowed and the order to search them in
+        """
+        tiling = self.tiling
+        live = filled
+        for y, cells in enumerate(tiling.row_cells):
+            if cleared >> y & 1:
+                live &= ~cells
+        left = tiling.left[index + 1]
+        full = tiling.full
+        # the lowest empty cell, solutions are found sooner filling it first
+        lowest = 0
+        for cells in tiling.row_cells:
+            empty = cells & ~filled
+            if empty:
+                lowest = empty & -empty
+                break
+        children = []
+        candidates = allowed & tiling.kind_tiles[tiling.kinds[index]]
+        while candidates:
+            bit = candidates & -candidates
+            candidates ^= bit
+            i = bit.bit_length() - 1
+            tile = tiling.tiles[i]
+            if tile.skipped & ~cleared or tile.above & live:
+                continue
+            supports = tiling.supports(i, cleared)
+            if supports >= 0 and not supports & live:
+                continue
+            child = filled | tile.cells
+            if child in self._failed:
+                continue
+            child_allowed = allowed & tiling.together[i] & left
+            # every empty cell still has a tile to fill it
+            empty = ~child & full
+            while empty:
+                cell = empty & -empty
+                if not child_allowed & tiling.cell_tiles[cell.bit_length() - 1]:
+                    break
+                empty ^= cell
+            if empty:
+                continue
+            child_cleared = cleared
+            for y, cells in enumerate(tiling.row_cells):
+                if child & cells == cells:
+                    child_cleared |= 1 << y
+            covers = bin(tile.below & ~filled).count('1')
+            if covers and not self.covered_cells:
+                continue
+            children.append((i, child, child_cleared, child_allowed, (covers, not tile.cells & lowest)))
+        return children
+
+    def solve(self, filled, cleared, allowed, index=0) -> typing.Optional[typing.List[Placement]]:
+        if index == len(self.tiling.kinds):
+            return []
+        if self.deadline is not None and time.time() > self.deadline:
+            raise _DeadlinePassed()
+        self.nodes += 1
+        children = self.children(filled, cleared, allowed, index)
+        # boards without covered cells first, they are solved more often
+        children.sort(key=lambda child: child[4])
+        for i, child, child_cleared, child_allowed, _ in children:
+            if child in self._failed:
+                continue
+            placements = self.solve(child, child_cleared, child_allowed, index + 1)
+            if placements is not None:
+                return [self.tiling.tiles[i].placement] + placements
+            self._failed.add(child)
+        return None
+
+
+def _solve_subtree(args) -> typing.Tuple[int, typing.Optional[typing.List[Placement]], bool, int]:
+    index, tiling, filled, cleared, allowed, deadline = args
+    solver = _Solver(tiling, deadline=deadline)
+    try:
+        return index, solver.solve(filled, cleared, allowed, 1), True, solver.nodes
+    except _DeadlinePassed:
+        return index, None, False, solver.nodes
+
+
+class PerfectClearSolver:
+    def __init__(self, workers=0):
+        """workers=0 solves in the calling process"""
+        self.workers = workers
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def solve(self, puzzle: Puzzle, timeout=None) -> SolveResult:
+        """
+        The placements of every piece that leave the board empty. With a
+        timeout the search stops after that many seconds, and an incomplete
+        result without placements does not tell whether there are any.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        board = puzzle.board
+        rows = _settled_rows(board)
+        cells = sum(bin(row).count('1') for row in rows) + CELLS_PER_PIECE * len(puzzle.pieces)
+        if cells % board.width:
+            return SolveResult(None, True, 0)
+        rows_to_clear = cells // board.width
+        if rows_to_clear + SPAWN_ROWS > board.height:
+            raise ValueError(f"{rows_to_clear} rows to clear leave less than {SPAWN_ROWS} rows "
+                             f"to spawn on a board {board.height} rows high")
+        if 0 in rows:
+            raise ValueError("Boards with an empty row under settled cells are not supported")
+        if not puzzle.pieces or len(rows) > rows_to_clear:
+            return SolveResult(None if rows else [], True, 0)
+        # the tilings get half the time at most, the search goes on without them
+        tiling = _Tiling(board.width, board.height, rows, puzzle.pieces, rows_to_clear,
+                         None if timeout is None else time.time() + timeout / 2)
+        if not tiling.usable:
+            return SolveResult(None, True, 0)
+        searched = 0
+        # most solutions never cover a cell, boards that do are searched only to prove there is none
+        for covered_cells in (False, True):
+            solver = _Solver(tiling, covered_cells, deadline)
+            state = tiling.start, 0, tiling.usable
+            if covered_cells and self.workers:
+                result = self._solve_split(solver, state, deadline)
+                result.searched += searched
+                return result
+            try:
+                placements = solver.solve(*state)
+            except _DeadlinePassed:
+                return SolveResult(None, False, searched + solver.nodes)
+            searched += solver.nodes
+            _logger.debug(f"Searched {solver.nodes} boards, covered cells {covered_cells}")
+            if placements is not None:
+                return SolveResult(placements, True, searched)
+        return SolveResult(None, True, searched)
+
+    def _solve_split(self, solver: _Solver, state, deadline) -> SolveResult:
+        roots = solver.children(*state, 0)
+        tasks = [(index, solver.tiling, child, cleared, allowed, deadline)
+                 for index, (_, child, cleared, allowed, _) in enumerate(roots)]
+        result = SolveResult(None, True, 1)
+        for index, placements, complete, searched in self._get_pool().imap_unordered(_solve_subtree, tasks):
+            result.searched += searched
+            if placements is not None:
+                # the rest of the subtrees are still being searched
+                self.close()
+                return SolveResult([solver.tiling.tiles[roots[index][0]].placement] + placements, True,
+                                   result.searched)
+            result.complete &= complete
+        return result
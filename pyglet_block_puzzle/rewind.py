@@ -0,0 +1,140 @@
+"""
+Rewind buffer of the game states after every piece lock.
+
+A snapshot keeps the score, level, cleared lines and bag, and only the rows
+that changed since the snapshot before it, stored as the XOR of the two
+versions of the row, so the same delta steps a row backward and forward.
+Every keyframe_interval snapshots a keyframe with all the rows is kept as
+well, rewinding starts from the closest keyframe when it is nearer than the
+current state. Rewinding costs the rows changed by the rewound pieces.
+"""
+import collections
+import typing
+from dataclasses import dataclass
+
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.serialization import GameState
+from pyglet_block_puzzle.shape import SHAPES, SHAPE_CODES
+
+_SHAPE_IDS = {code: shape_id for shape_id, code in SHAPE_CODES.items()}
+
+
+@dataclass
+class _Snapshot:
+    score: int
+    level: int
+    cleared_lines: int
+    bag: int
+    # the index of every changed row followed by the XOR of its old and new cells
+    delta: bytes
+    keyframe: typing.Optional[bytes] = None
+
+
+def _board_rows(board: Board) -> typing.List[bytes]:
+    piece = board.get_active_piece()
+    own_cells = {(block.x, block.y) for block in piece} if piece else set()
+    rows = [bytearray(board.width) for _ in range(board.height)]
+    for (x, y), shape_id in board.get_blocks().items():
+        if (x, y) not in own_cells:
+            rows[y][x] = SHAPE_CODES[shape_id]
+    return [bytes(row) for row in rows]
+
+
+def _xor(a: bytes, b: bytes) -> bytes:
+    return (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+
+class RewindBuffer:
+    def __init__(self, width, height, capacity=4096, keyframe_interval=64):
+        self.width = width
+        self.height = height
+        self.keyframe_interval = keyframe_interval
+        self._snapshots = collections.deque(maxlen=capacity)
+        self._rows = [bytes(width)] * height
+        self._pushed = 0
+
+    def __len__(self):
+        return len(self._snapshots)
+
+    def clear(self):
+        self._snapshots.clear()
+        self._rows = [bytes(self.width)] * self.height
+        self._pushed = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of board data held, deltas and keyframes"""
+        return sum(len(snapshot.delta) + len(snapshot.keyframe or b'') for snapshot in self._snapshots)
+
+    def push(self, state: GameState):
+        """Snapshot a state, the active piece is not part of it"""
+        board = state.board
+        if (board.width, board.height) != (self.width, self.height):
+            raise ValueError(f"Board size {board.width}x{board.height} does not match "
+                             f"the buffer size {self.width}x{self.height}")
+        rows = _board_rows(board)
+        delta = bytearray()
+        for y, (old, new) in enumerate(zip(self._rows, rows)):
+            if old != new:
+                delta.append(y)
+                delta += _xor(old, new)
+        bag = 0
+        for shape in state.bag:
+            bag |= 1 << SHAPES.index(shape)
+        keyframe = b''.join(rows) if self._pushed % self.keyframe_interval == 0 else None
+        self._snapshots.append(_Snapshot(state.score, state.level, state.cleared_lines, bag, bytes(delta), keyframe))
+        self._rows = rows
+        self._pushed += 1
+
+    def _undo(self, rows: typing.List[bytes], snapshot: _Snapshot):
+        step = self.width + 1
+        delta = snapshot.delta
+        for offset in range(0, len(delta), step):
+            y = delta[offset]
+            rows[y] = _xor(rows[y], delta[offset + 1:offset + step])
+
+    def _rows_at(self, index) -> typing.List[bytes]:
+        """The rows of the snapshot at index, walking back from the current rows or from a keyframe"""
+        snapshots = self._snapshots
+        start, rows = len(snapshots) - 1, list(self._rows)
+        # a keyframe is taken every keyframe_interval snapshots
+        for keyframe_index in range(index, min(index + self.keyframe_interval, len(snapshots) - 1)):
+            keyframe = snapshots[keyframe_index].keyframe
+            if keyframe is not None:
+                start = keyframe_index
+                rows = [keyframe[y * self.width:(y + 1) * self.width] for y in range(self.height)]
+                break
+        for snapshot_index in range(start, index, -1):
+            self._undo(rows, snapshots[snapshot_index])
+        return rows
+
+    def _index(self, pieces_back) -> int:
+        if not 0 <= pieces_back < len(self._snapshots):
+            raise IndexError(f"Can not go back {pieces_back} pieces with {len(self._snapshots)} snapshots")
+        return len(self._snapshots) - 1 - pieces_back
+
+    def state(self, pieces_back=0) -> GameState:
+        """The state a number of pieces before the latest snapshot, the buffer is unchanged"""
+        index = self._index(pieces_back)
+        return self._game_state(self._snapshots[index], self._rows_at(index))
+
+    def rewind(self, pieces=1) -> GameState:
+        """Go back a number of pieces, the snapshots after it are dropped"""
+        index = self._index(pieces)
+        self._rows = self._rows_at(index)
+        for _ in range(pieces):
+            self._snapshots.pop()
+        self._pushed -= pieces
+        return self._game_state(self._snapshots[index], self._rows)
+
+    def _game_state(self, snapshot: _Snapshot, rows: typing.List[bytes]) -> GameState:
+        board = Board(self.width, self.height, print_board=False)
+        for y, row in enumerate(rows):
+            for x, code in enumerate(row):
+                if code:
+                    board.set_block(x, y, _SHAPE_IDS[code])
+        return GameState(board=board,
+                         bag={shape for i, shape in enumerate(SHAPES) if snapshot.bag >> i & 1},
+                         score=snapshot.score,
+                         level=snapshot.level,
+                         cleared_lines=snapshot.cleared_lines)
@@ -0,0 +1,20 @@
+"""Scoring and level rules shared by the pyglet game and the headless simulations"""
+
+SCORE_LINES = {0: 0, 1: 100, 2: 300, 3: 500, 4: 800}
+SCORE_SOFT_DROP = 1
+SCORE_HARD_DROP = 2
+LINES_PER_LEVEL = 10
+MAX_LEVEL = 20
+INITIAL_GRAVITY = 0.7  # seconds per block
+GRAVITY_FACTOR = 0.8
+
+
+def gravity(level):
+    return INITIAL_GRAVITY * GRAVITY_FACTOR ** (level - 1)
+
+
+def update_level(level, cleared_lines):
+    """Level up once enough lines were cleared, returns the new level and the lines left"""
+    if cleared_lines >= LINES_PER_LEVEL and level < MAX_LEVEL:
+        return level + 1, cleared_lines - LINES_PER_LEVEL
+    return level, cleared_lines
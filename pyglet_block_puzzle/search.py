@@ -0,0 +1,253 @@
+"""
+Lookahead search for the placement of the active piece.
+
+The search tries every placement of the active piece and of the preview
+pieces after it, and scores the boards it reaches with evaluate. The root
+placements are split across a pool of worker processes, each worker gets the
+board after its root placement as a buffer of shape codes and searches the
+rest of the tree on a FastBoard.
+
+Results are merged as they arrive, when the deadline passes the best
+placement found so far is returned and the workers drop their stale work.
+A cancelled search returns the same way, its pool is replaced because the
+workers cannot see the cancel.
+The pool is kept between moves, close the search (or use it as a context
+manager) to stop it.
+"""
+import logging
+import multiprocessing
+import os
+import time
+import typing
+from dataclasses import dataclass
+
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.fast_board import FastBoard
+from pyglet_block_puzzle.board.placement import Placement, get_placements
+from pyglet_block_puzzle.shape import SHAPES, SHAPE_CODES, Shape
+
+_logger = logging.getLogger(__name__)
+
+ROTATIONS = 4
+GAME_OVER_SCORE = -1e9
+# weights of the lines cleared, aggregate height, holes and bumpiness
+WEIGHTS = (0.76, -0.51, -0.36, -0.18)
+# seconds between the checks of a cancel while waiting for the pool
+_CANCEL_POLL = 0.05
+
+Evaluate = typing.Callable[[FastBoard], float]
+
+
+def evaluate(board: FastBoard) -> float:
+    """Score a board without its active piece, higher is better"""
+    _, height_weight, holes_weight, bumpiness_weight = WEIGHTS
+    heights = [0] * board.width
+    holes = 0
+    covered = 0
+    for y, row in enumerate(board.rows):
+        # cells below a settled cell of the same column that are empty are holes
+        holes += bin(covered & ~row).count('1')
+        new = row & ~covered
+        x = 0
+        while new:
+            if new & 1:
+                heights[x] = board.height - y
+            new >>= 1
+            x += 1
+        covered |= row
+    bumpiness = sum(abs(a - b) for a, b in zip(heights, heights[1:]))
+    return height_weight * sum(heights) + holes_weight * holes + bumpiness_weight * bumpiness
+
+
+def children(board: FastBoard,
+             shape: typing.Type[Shape]) -> typing.Iterator[typing.Tuple[Placement, FastBoard, int]]:
+    """Spawn the shape and yield every placement that leads to a distinct board, with the board and lines cleared"""
+    board.spawn_piece(shape)
+    if board.is_game_over():
+        return
+    seen = set()
+    for rotations in range(ROTATIONS):
+        limits = board.get_shift_limits(rotations)
+        if limits is None:
+            break
+        for shift in range(limits[0], limits[1] + 1):
+            child = board.copy()
+            if child.place(rotations, shift) < 0:
+                continue
+            lines = child.clear_completed_rows()
+            key = tuple(child.rows)
+            if key not in seen:
+                seen.add(key)
+                yield Placement(rotations, shift), child, lines
+
+
+Cancelled = typing.Callable[[], bool]
+
+
+class _DeadlinePassed(Exception):
+    pass
+
+
+def _search(board: FastBoard, shapes, evaluate_board: Evaluate, deadline, cancelled: Cancelled = None) -> float:
+    if not shapes:
+        return evaluate_board(board)
+    if deadline is not None and time.time() > deadline or cancelled is not None and cancelled():
+        raise _DeadlinePassed()
+    board = board.copy()
+    best = None
+    for _, child, lines in children(board, shapes[0]):
+        score = WEIGHTS[0] * lines + _search(child, shapes[1:], evaluate_board, deadline, cancelled)
+        if best is None or score > best:
+            best = score
+    # the shape could not be spawned
+    return GAME_OVER_SCORE if best is None else best
+
+
+@dataclass
+class _Task:
+    index: int
+    width: int
+    height: int
+    cells: bytes
+    lines: int
+    # indexes into SHAPES of the pieces after the root placement
+    shapes: typing.Tuple[int, ...]
+    evaluate: Evaluate
+    deadline: typing.Optional[float]
+
+
+def _run_task(task: _Task, cancelled: Cancelled = None) -> typing.Tuple[int, typing.Optional[float]]:
+    """Score the subtree of a root placement, None if the deadline passed or the search was cancelled first"""
+    board = FastBoard(task.width, task.height)
+    board.load(task.cells)
+    try:
+        score = _search(board, [SHAPES[i] for i in task.shapes], task.evaluate, task.deadline, cancelled)
+    except _DeadlinePassed:
+        return task.index, None
+    return task.index, WEIGHTS[0] * task.lines + score
+
+
+@dataclass
+class SearchResult:
+    placement: typing.Optional[Placement]
+    score: float
+    # False when the deadline passed or the search was cancelled before every root placement was searched
+    complete: bool
+    searched: int
+
+
+class PlacementSearch:
+    def __init__(self, depth=3, workers=None, evaluate_board: Evaluate = evaluate):
+        """
+        depth counts the active piece, depth 3 searches two preview pieces.
+        workers=0 searches in the calling process.
+        """
+        if depth < 1:
+            raise ValueError("Depth must be at least 1")
+        self.depth = depth
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self._evaluate = evaluate_board
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.workers)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _root_tasks(self, board: Board, preview, deadline) -> typing.Tuple[typing.List[Placement], typing.List[_Task]]:
+        active = board.get_active_piece()
+        own_cells = {(block.x, block.y) for block in active}
+        cells = bytearray(board.width * board.height)
+        for (x, y), shape_id in board.get_blocks().items():
+            if (x, y) not in own_cells:
+                cells[y * board.width + x] = SHAPE_CODES[shape_id]
+        shapes = tuple(SHAPES.index(shape) for shape in preview[:self.depth - 1])
+        placements = get_placements(board)
+        tasks = []
+        for index, placement in enumerate(placements):
+            child_cells = bytearray(cells)
+            for block in placement.landing:
+                child_cells[block.y * board.width + block.x] = SHAPE_CODES[active.id]
+            child = FastBoard(board.width, board.height)
+            child.load(child_cells)
+            lines = child.clear_completed_rows()
+            tasks.append(_Task(index, board.width, board.height, bytes(child.cells), lines,
+                               shapes, self._evaluate, deadline))
+        return placements, tasks
+
+    def search(self, board: Board, preview: typing.Sequence[typing.Type[Shape]] = (),
+               timeout: float = None, cancelled: Cancelled = None) -> SearchResult:
+        """
+        Find the placement of the active piece with the best score after the
+        preview pieces (up to depth - 1 of them) are placed as well.
+        The search stops early once cancelled() returns True.
+        """
+        if not board.is_piece_active():
+            raise RuntimeError("No active piece")
+        deadline = time.time() + timeout if timeout is not None else None
+        placements, tasks = self._root_tasks(board, preview, deadline)
+        if not placements:
+            return SearchResult(None, GAME_OVER_SCORE, True, 0)
+        if not tasks[0].shapes:
+            return self._best_root(placements, tasks, complete=True)
+        scores = {}
+        for index, score in self._run(tasks, deadline, cancelled):
+            if score is not None:
+                scores[index] = score
+        if not scores:
+            _logger.info("No placement searched before the deadline")
+            return self._best_root(placements, tasks, complete=False)
+        best = max(sorted(scores), key=lambda i: scores[i])
+        _logger.debug(f"Searched {len(scores)}/{len(placements)} placements, best {placements[best]}")
+        return SearchResult(placements[best], scores[best], len(scores) == len(placements), len(scores))
+
+    def _best_root(self, placements, tasks: typing.List[_Task], complete) -> SearchResult:
+        """The best placement scored on its own board, without the preview pieces"""
+        scores = [WEIGHTS[0] * task.lines + self._evaluate(self._task_board(task)) for task in tasks]
+        best = max(range(len(placements)), key=lambda i: scores[i])
+        return SearchResult(placements[best], scores[best], complete, len(placements) if complete else 0)
+
+    @staticmethod
+    def _task_board(task: _Task) -> FastBoard:
+        board = FastBoard(task.width, task.height)
+        board.load(task.cells)
+        return board
+
+    def _run(self, tasks: typing.List[_Task], deadline,
+             cancelled: Cancelled = None) -> typing.Iterator[typing.Tuple[int, typing.Optional[float]]]:
+        if not self.workers:
+            for task in tasks:
+                yield _run_task(task, cancelled)
+            return
+        results = self._get_pool().imap_unordered(_run_task, tasks)
+        for _ in tasks:
+            # the workers cannot see the cancel, it is checked here between results and
+            # the pool is replaced so the next search does not queue behind the stale work
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.time())
+                if cancelled is not None:
+                    timeout = _CANCEL_POLL if timeout is None else min(timeout, _CANCEL_POLL)
+                try:
+                    yield results.next(timeout)
+                    break
+                except multiprocessing.TimeoutError:
+                    if cancelled is not None and cancelled():
+                        _logger.info("Search cancelled")
+                        self.close()
+                        return
+                    if deadline is not None and time.time() >= deadline:
+                        # the workers notice the deadline on their own and drop the rest
+                        _logger.info("Search deadline passed")
+                        return
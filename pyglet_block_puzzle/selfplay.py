@@ -0,0 +1,224 @@
+"""
+Training data from self-play.
+
+Headless games yield (state, action, reward, next_state) transitions with the
+states packed by GameStateCodec. Transitions are written to chunk files of a
+fixed number of fixed-size records, and read back one chunk block at a time,
+so neither side ever holds more than a chunk in memory.
+"""
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import struct
+import typing
+from dataclasses import dataclass
+
+from pyglet_block_puzzle.board.placement import Placement
+from pyglet_block_puzzle.serialization import GameStateCodec
+from pyglet_block_puzzle.simulation import HeadlessGame
+
+_logger = logging.getLogger(__name__)
+
+_CHUNK_MAGIC = b'BPTR'
+# magic, board width, board height, record size
+_CHUNK_HEADER = struct.Struct('<4sBBI')
+# rotations, shift, reward, done
+_ACTION = struct.Struct('<Bbi?')
+CHUNK_FILE_FORMAT = 'chunk-{:08d}.bin'
+
+Policy = typing.Callable[[HeadlessGame, typing.List[Placement], random.Random], Placement]
+
+
+@dataclass
+class Transition:
+    state: bytes
+    action: Placement
+    reward: int
+    next_state: bytes
+    done: bool
+
+
+def random_policy(game: HeadlessGame, placements: typing.List[Placement], rng: random.Random) -> Placement:
+    return rng.choice(placements)
+
+
+def self_play(width=10, height=20, seed=None, games=None,
+              policy: Policy = random_policy) -> typing.Iterator[Transition]:
+    """Play games one after another (forever if games is None) and yield their transitions"""
+    rng = random.Random(seed)
+    codec = GameStateCodec(width, height)
+    game = HeadlessGame(width, height, seed=rng.randrange(2 ** 32))
+    played = 0
+    while games is None or played < games:
+        state = codec.pack(game.get_state())
+        while not game.is_game_over():
+            action = policy(game, game.get_placements(), rng)
+            reward = game.step(action)
+            next_state = codec.pack(game.get_state())
+            yield Transition(state, action, reward, next_state, game.is_game_over())
+            state = next_state
+        played += 1
+        game.reset(rng.randrange(2 ** 32))
+
+
+class TransitionCodec:
+    def __init__(self, width, height):
+        self.states = GameStateCodec(width, height)
+        self.record_size = 2 * self.states.record_size + _ACTION.size
+
+    def pack(self, transition: Transition) -> bytes:
+        action = transition.action
+        return transition.state + \
+            _ACTION.pack(action.rotations, action.shift, transition.reward, transition.done) + \
+            transition.next_state
+
+    def unpack(self, data) -> Transition:
+        state_size = self.states.record_size
+        rotations, shift, reward, done = _ACTION.unpack_from(data, state_size)
+        return Transition(bytes(data[:state_size]),
+                          Placement(rotations, shift),
+                          reward,
+                          bytes(data[state_size + _ACTION.size:]),
+                          done)
+
+
+class ChunkWriter:
+    """Write packed transitions to chunk files holding chunk_size records each"""
+    def __init__(self, directory, width, height, chunk_size=1 << 16):
+        self.codec = TransitionCodec(width, height)
+        self._directory = directory
+        self._header = _CHUNK_HEADER.pack(_CHUNK_MAGIC, width, height, self.codec.record_size)
+        self._chunk_size = chunk_size
+        self._chunk_index = 0
+        self._records_in_chunk = 0
+        self._file = None
+        self.records = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, transition: Transition):
+        self.write_packed(self.codec.pack(transition))
+
+    def write_packed(self, records: bytes):
+        """Write a block of already packed records"""
+        record_size = self.codec.record_size
+        if len(records) % record_size:
+            raise ValueError(f"Packed records must be a multiple of {record_size} bytes")
+        view = memoryview(records)
+        while view:
+            if self._file is None:
+                self._open_chunk()
+            count = min(len(view) // record_size, self._chunk_size - self._records_in_chunk)
+            self._file.write(view[:count * record_size])
+            view = view[count * record_size:]
+            self._records_in_chunk += count
+            self.records += count
+            if self._records_in_chunk == self._chunk_size:
+                self._close_chunk()
+
+    def _open_chunk(self):
+        path = os.path.join(self._directory, CHUNK_FILE_FORMAT.format(self._chunk_index))
+        self._file = open(path, 'wb')
+        self._file.write(self._header)
+        self._records_in_chunk = 0
+
+    def _close_chunk(self):
+        self._file.close()
+        self._file = None
+        self._chunk_index += 1
+
+    def close(self):
+        if self._file is not None:
+            self._close_chunk()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_transitions(directory, block_records=1024) -> typing.Iterator[Transition]:
+    """Stream the transitions of all the chunks in a directory, block_records at a time"""
+    for name in sorted(os.listdir(directory)):
+        if not name.startswith('chunk-'):
+            continue
+        with open(os.path.join(directory, name), 'rb') as chunk:
+            magic, width, height, record_size = _CHUNK_HEADER.unpack(chunk.read(_CHUNK_HEADER.size))
+            if magic != _CHUNK_MAGIC:
+                raise ValueError(f"{name} is not a transitions chunk")
+            codec = TransitionCodec(width, height)
+            while True:
+                block = chunk.read(block_records * record_size)
+                if not block:
+                    break
+                for offset in range(0, len(block) - record_size + 1, record_size):
+                    yield codec.unpack(memoryview(block)[offset:offset + record_size])
+
+
+def _self_play_worker(records: multiprocessing.Queue, stop, width, height, seed, batch_records):
+    codec = TransitionCodec(width, height)
+    batch = []
+    for transition in self_play(width, height, seed=seed):
+        if stop.is_set():
+            return
+        batch.append(codec.pack(transition))
+        if len(batch) == batch_records:
+            # blocks while the queue is full, the writer sets the pace of the workers
+            while not stop.is_set():
+                try:
+                    records.put(b''.join(batch), timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            batch.clear()
+
+
+def _get_batch(records: multiprocessing.Queue, processes: typing.List[multiprocessing.Process]) -> bytes:
+    """The next batch of records, raises when a worker died instead of waiting for it forever"""
+    while True:
+        try:
+            return records.get(timeout=0.5)
+        except queue.Empty:
+            # workers only stop when they are told to, any that exited crashed
+            dead = [process for process in processes if not process.is_alive()]
+            if dead:
+                raise RuntimeError(f"Self-play worker exited with code {dead[0].exitcode}")
+
+
+def run_self_play(directory, transitions, width=10, height=20, workers=None, seed=0,
+                  chunk_size=1 << 16, batch_records=256, queue_size=None) -> int:
+    """
+    Generate transitions with worker processes and write them to chunk files.
+
+    Workers send batches of packed records through a bounded queue, at most
+    queue_size batches wait for the writer, so memory stays bounded and workers
+    keep playing while the writer flushes. Returns the number of records written.
+    """
+    workers = workers or os.cpu_count() or 1
+    records = multiprocessing.Queue(maxsize=queue_size or 2 * workers)
+    stop = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=_self_play_worker,
+                                         args=(records, stop, width, height, seed + i, batch_records),
+                                         daemon=True)
+                 for i in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        with ChunkWriter(directory, width, height, chunk_size) as writer:
+            while writer.records < transitions:
+                batch = _get_batch(records, processes)
+                missing = (transitions - writer.records) * writer.codec.record_size
+                writer.write_packed(batch[:missing])
+            _logger.info(f"Wrote {writer.records} transitions to {directory}")
+            return writer.records
+    finally:
+        stop.set()
+        while any(process.is_alive() for process in processes):
+            try:
+                records.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for process in processes:
+            process.join()
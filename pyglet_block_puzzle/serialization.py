@@ -0,0 +1,185 @@
+"""
+Bit-packed encoding of a full game state and an archive of fixed-size records.
+
+Every state of a given board size packs into the same number of bytes, so an
+archive file is a header followed by records that can be memory-mapped and
+read by index without parsing the records before it.
+"""
+import mmap
+import os
+import struct
+import typing
+from dataclasses import dataclass, field
+from math import floor
+
+from pyglet_block_puzzle.board.block import BoardBlock
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.piece import BoardPiece
+from pyglet_block_puzzle.shape import SHAPES, SHAPE_CODES, Shape
+
+CELL_BITS = 3
+PIECE_BLOCKS = 4
+
+# score, cleared lines, level, flags, bag, piece shape code, piece center * 2 (x, y)
+_HEADER = struct.Struct('<IHBBBBbb')
+_FLAG_GAME_OVER = 1
+_FLAG_ACTIVE_PIECE = 2
+
+_ARCHIVE_MAGIC = b'BPGS'
+_ARCHIVE_VERSION = 1
+# magic, version, board width, board height, record size
+_ARCHIVE_HEADER = struct.Struct('<4sBBBI')
+
+
+@dataclass
+class GameState:
+    board: Board
+    bag: typing.Set[typing.Type[Shape]] = field(default_factory=set)
+    score: int = 0
+    level: int = 1
+    cleared_lines: int = 0
+
+
+class GameStateCodec:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._cells_size = (width * height * CELL_BITS + 7) // 8
+        self.record_size = _HEADER.size + PIECE_BLOCKS + self._cells_size
+
+    def pack(self, state: GameState) -> bytes:
+        board = state.board
+        if (board.width, board.height) != (self.width, self.height):
+            raise ValueError(f"Board size {board.width}x{board.height} does not match "
+                             f"the codec size {self.width}x{self.height}")
+        piece = board.get_active_piece()
+        flags = _FLAG_GAME_OVER if board.is_game_over() else 0
+        bag = 0
+        for shape in state.bag:
+            bag |= 1 << (SHAPE_CODES[shape.id] - 1)
+
+        shape_code, center_x, center_y = 0, 0, 0
+        offsets = bytes(PIECE_BLOCKS)
+        if piece:
+            flags |= _FLAG_ACTIVE_PIECE
+            center = piece.center
+            shape_code, center_x, center_y = SHAPE_CODES[piece.id], int(center.x * 2), int(center.y * 2)
+            base_x, base_y = floor(center.x), floor(center.y)
+            # block offsets from the center are within [-8, 8) in both directions
+            offsets = bytes(((block.x - base_x + 8) << 4) | (block.y - base_y + 8) for block in piece)
+
+        cells = 0
+        for (x, y), block_id in board.get_blocks().items():
+            cells |= SHAPE_CODES[block_id] << ((y * self.width + x) * CELL_BITS)
+
+        return _HEADER.pack(state.score, state.cleared_lines, state.level, flags, bag,
+                            shape_code, center_x, center_y) + \
+            offsets + cells.to_bytes(self._cells_size, 'little')
+
+    def unpack(self, data) -> GameState:
+        if len(data) != self.record_size:
+            raise ValueError(f"Expected a record of {self.record_size} bytes, got {len(data)}")
+        score, cleared_lines, level, flags, bag, shape_code, center_x, center_y = \
+            _HEADER.unpack_from(data)
+        board = Board(self.width, self.height, print_board=False)
+
+        cells = int.from_bytes(data[_HEADER.size + PIECE_BLOCKS:], 'little')
+        mask = (1 << CELL_BITS) - 1
+        index = 0
+        while cells:
+            code = cells & mask
+            if code:
+                board.set_block(index % self.width, index // self.width, SHAPES[code - 1].id)
+            cells >>= CELL_BITS
+            index += 1
+
+        if flags & _FLAG_ACTIVE_PIECE:
+            center = BoardBlock(center_x // 2 if center_x % 2 == 0 else center_x / 2,
+                                center_y // 2 if center_y % 2 == 0 else center_y / 2)
+            base_x, base_y = floor(center.x), floor(center.y)
+            blocks = [BoardBlock(base_x + (offset >> 4) - 8, base_y + (offset & 0x0f) - 8)
+                      for offset in data[_HEADER.size:_HEADER.size + PIECE_BLOCKS]]
+            board.set_active_piece(BoardPiece(SHAPES[shape_code - 1], blocks, center))
+        if flags & _FLAG_GAME_OVER:
+            board.end_game()
+
+        return GameState(board=board,
+                         bag={shape for i, shape in enumerate(SHAPES) if bag & (1 << i)},
+                         score=score,
+                         level=level,
+                         cleared_lines=cleared_lines)
+
+
+class StateArchive:
+    """
+    Append-only file of packed game states.
+
+    Records are read through a memory map of the file, the map is refreshed
+    when records appended after it was created are requested.
+    """
+    def __init__(self, path, width, height):
+        self.codec = GameStateCodec(width, height)
+        self._path = path
+        self._file = open(path, 'a+b')
+        self._map = None
+        self._file.seek(0, os.SEEK_END)
+        if self._file.tell() == 0:
+            self._file.write(_ARCHIVE_HEADER.pack(_ARCHIVE_MAGIC, _ARCHIVE_VERSION,
+                                                  width, height, self.codec.record_size))
+            self._file.flush()
+        else:
+            self._file.seek(0)
+            magic, version, file_width, file_height, record_size = \
+                _ARCHIVE_HEADER.unpack(self._file.read(_ARCHIVE_HEADER.size))
+            if magic != _ARCHIVE_MAGIC or version != _ARCHIVE_VERSION:
+                raise ValueError(f"{path} is not a game state archive")
+            if (file_width, file_height, record_size) != (width, height, self.codec.record_size):
+                raise ValueError(f"{path} holds states of {file_width}x{file_height} boards")
+        self._file.seek(0, os.SEEK_END)
+        self._length = (self._file.tell() - _ARCHIVE_HEADER.size) // self.codec.record_size
+
+    def __len__(self):
+        return self._length
+
+    def append(self, state: GameState) -> int:
+        self._file.write(self.codec.pack(state))
+        self._length += 1
+        return self._length - 1
+
+    def extend(self, states: typing.Iterable[GameState]):
+        for state in states:
+            self.append(state)
+
+    def flush(self):
+        self._file.flush()
+
+    def get_record(self, index) -> bytes:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(f"Record {index} is out of range")
+        offset = _ARCHIVE_HEADER.size + index * self.codec.record_size
+        if self._map is None or len(self._map) < offset + self.codec.record_size:
+            self._remap()
+        return self._map[offset:offset + self.codec.record_size]
+
+    def __getitem__(self, index) -> GameState:
+        return self.codec.unpack(self.get_record(index))
+
+    def _remap(self):
+        self.flush()
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
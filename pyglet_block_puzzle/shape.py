@@ -1,4 +1,5 @@
 import random
+import typing
 from abc import abstractmethod
 
 from pyglet_block_puzzle.color import Color
@@ -96,29 +97,59 @@ class Ti(Shape):
     color = Color.PURPLE
 
 
+SHAPES = (
+    Square,
+    Ra,
+    Straight,
+    Ri,
+    Zed,
+    Ti,
+    Ss,
+)
+# compact numeric ids for binary formats, 0 is reserved for an empty cell
+SHAPE_CODES = {shape.id: code for code, shape in enumerate(SHAPES, start=1)}
+
+
 class ShapeHelper:
-    def __init__(self):
-        self._shapes = [
-            Square,
-            Ra,
-            Straight,
-            Ri,
-            Zed,
-            Ti,
-            Ss,
-        ]
+    def __init__(self, rng: random.Random = None):
+        self._random = rng or random.Random()
+        self._shapes = list(SHAPES)
         self._ids_shapes = {shape.id: shape for shape in self._shapes}
         self._bag_of_shapes = set(self._shapes)
 
     def get_shape_from_id(self, shape_id) -> Shape:
         return self._ids_shapes[shape_id]
 
-    def reset(self):
+    def reset(self, seed=None):
+        if seed is not None:
+            self._random.seed(seed)
         self._bag_of_shapes = set()
 
+    @property
+    def bag(self) -> typing.Set[typing.Type[Shape]]:
+        return set(self._bag_of_shapes)
+
+    @bag.setter
+    def bag(self, shapes: typing.Iterable[typing.Type[Shape]]):
+        self._bag_of_shapes = set(shapes)
+
+    def preview(self, count) -> typing.List[typing.Type[Shape]]:
+        """The next shapes get_random_shape will return, without consuming them"""
+        # drawn and put back, so the bag of a saved state still holds them
+        random_state = self._random.getstate()
+        bag = set(self._bag_of_shapes)
+        shapes = [self._draw_shape() for _ in range(count)]
+        self._random.setstate(random_state)
+        self._bag_of_shapes = bag
+        return shapes
+
     def get_random_shape(self):
+        return self._draw_shape()
+
+    def _draw_shape(self):
         if not self._bag_of_shapes:
             self._bag_of_shapes = set(self._shapes)
-        shape = random.sample(self._bag_of_shapes, k=1)[0]
+        # sets are ordered by hash, sort them so a seeded random picks the same shapes
+        shape = self._random.choice(sorted(self._bag_of_shapes, key=self._shapes.index))
         self._bag_of_shapes.remove(shape)
         return shape
@@ -0,0 +1,64 @@
+import logging
+import random
+import typing
+
+from pyglet_block_puzzle import rules
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.placement import Placement, apply_placement, get_placements
+from pyglet_block_puzzle.serialization import GameState
+from pyglet_block_puzzle.shape import ShapeHelper
+
+_logger = logging.getLogger(__name__)
+
+
+class HeadlessGame:
+    """
+    The game rules without pyglet, every step places a whole piece.
+
+    Scoring, line clearing and levels follow Game, a placement scores as a hard drop.
+    """
+    def __init__(self, width=10, height=20, seed=None):
+        self.width = width
+        self.height = height
+        self.piece_maker = ShapeHelper(random.Random(seed))
+        self.reset(seed)
+
+    # noinspection PyAttributeOutsideInit
+    def reset(self, seed=None):
+        self.board = Board(self.width, self.height, print_board=False)
+        self.piece_maker.reset(seed)
+        self.score = 0
+        self.level = 1
+        self.cleared_lines = 0
+        self._spawn_new_piece()
+
+    def is_game_over(self):
+        return self.board.is_game_over()
+
+    def get_placements(self) -> typing.List[Placement]:
+        return get_placements(self.board)
+
+    def step(self, placement: Placement) -> int:
+        """Place the active piece and spawn the next one, returns the score of the placement"""
+        if self.is_game_over():
+            raise RuntimeError("Game is over")
+        reward = apply_placement(self.board, placement) * rules.SCORE_HARD_DROP
+        full_rows = self.board.clear_completed_rows()
+        reward += self.level * rules.SCORE_LINES[full_rows]
+        self.cleared_lines += full_rows
+        self.level, self.cleared_lines = rules.update_level(self.level, self.cleared_lines)
+        self.score += reward
+        self._spawn_new_piece()
+        return reward
+
+    def _spawn_new_piece(self):
+        self.board.spawn_piece(self.piece_maker.get_random_shape())
+        if self.board.is_game_over():
+            _logger.info("Game over!")
+
+    def get_state(self) -> GameState:
+        return GameState(board=self.board,
+                         bag=self.piece_maker.bag,
+                         score=self.score,
+                         level=self.level,
+                         cleared_lines=self.cleared_lines)
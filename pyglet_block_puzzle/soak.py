@@ -0,0 +1,240 @@
+"""
+Long-run memory soak of the Game.
+
+Every subsystem that creates and drops objects over a session is driven on
+its own for a stretch of simulated time: the gameplay loop (Block churn in
+_redraw_pieces), level ups (a Label each, deleted by a scheduled callback),
+pause toggles (a Label each) and resets (a new Board each). Time comes from a
+VirtualClock, so hours of play run as fast as the game can update.
+
+tracemalloc measures the bytes allocated during every frame and the memory
+retained after the warm up, gc statistics count the objects left behind.
+
+Run ``python -m pyglet_block_puzzle.soak --hours 4`` for a kiosk length soak.
+"""
+import argparse
+import gc
+import logging
+import random
+import sys
+import tracemalloc
+import typing
+from dataclasses import dataclass, field
+
+import pyglet
+from pyglet.window import key
+
+from pyglet_block_puzzle.clock import VirtualClock
+from pyglet_block_puzzle.game import Game
+from pyglet_block_puzzle.shape import ShapeHelper
+
+_logger = logging.getLogger(__name__)
+
+FRAME_TIME = 1 / 120.0
+# retained bytes per simulated hour above which a subsystem fails the soak
+MAX_GROWTH_PER_HOUR = 1 << 20
+SEGMENTS = 3
+
+_MOVE_KEYS = (key.LEFT, key.RIGHT, key.DOWN)
+
+
+@dataclass
+class SubsystemReport:
+    name: str
+    frames: int = 0
+    allocated_bytes: int = 0
+    retained_bytes: int = 0
+    # frames after the first segment, the growth over them is the steady growth
+    steady_frames: int = 0
+    steady_growth_bytes: int = 0
+    steady_growth_objects: int = 0
+    collections: int = 0
+    # biggest allocations retained over the steady segments, by source line
+    top_growth: typing.List[str] = field(default_factory=list)
+
+    @property
+    def hours(self):
+        return self.frames * FRAME_TIME / 3600
+
+    @property
+    def allocated_per_frame(self):
+        return self.allocated_bytes / self.frames if self.frames else 0
+
+    @property
+    def growth_per_hour(self):
+        """Extrapolated from every segment of the run after the first"""
+        return self.steady_growth_bytes / (self.steady_frames * FRAME_TIME / 3600) if self.steady_frames else 0
+
+    def __str__(self):
+        return (f"{self.name}: {self.frames} frames, {self.allocated_per_frame:,.0f} B/frame allocated, "
+                f"{self.retained_bytes:+,} B retained, {self.steady_growth_bytes:+,} B / "
+                f"{self.steady_growth_objects:+} objects over the steady segments "
+                f"({self.growth_per_hour:+,.0f} B/hour), {self.collections} gc collections")
+
+
+@dataclass
+class SoakReport:
+    subsystems: typing.List[SubsystemReport] = field(default_factory=list)
+    max_growth_per_hour: float = MAX_GROWTH_PER_HOUR
+
+    @property
+    def failures(self) -> typing.List[SubsystemReport]:
+        return [report for report in self.subsystems if report.growth_per_hour > self.max_growth_per_hour]
+
+    def __str__(self):
+        lines = []
+        for report in self.subsystems:
+            lines.append(('FAIL ' if report in self.failures else 'ok   ') + str(report))
+            if report in self.failures:
+                lines += ['    ' + line for line in report.top_growth]
+        return '\n'.join(lines)
+
+
+class SoakRunner:
+    """Drive a Game frame by frame on a virtual clock, the way BlockPuzzle does"""
+    def __init__(self, width=250, height=500, block_size=25, seed=None):
+        self.clock = VirtualClock()
+        self._random = random.Random(seed)
+        self.game = Game(width, height, block_size, pyglet.graphics.Batch(), pyglet.graphics.Batch(),
+                         clock=self.clock)
+        self.game.piece_maker = ShapeHelper(random.Random(seed))
+
+    def close(self):
+        self.clock.unschedule(self.game.fall)
+        self.clock.unschedule(self.game.move)
+
+    def frame(self):
+        """One window update: play a random input, run the due callbacks and update the game"""
+        game = self.game
+        if game.game_over:
+            game.reset()
+        roll = self._random.random()
+        if roll < 0.05:
+            game.key_handler[self._random.choice(_MOVE_KEYS)] = True
+        elif roll < 0.15:
+            game.key_handler.clear()
+        elif roll < 0.17:
+            game.on_key_press(key.UP, 0)
+        elif roll < 0.175:
+            game.on_key_press(key.SPACE, 0)
+        self.clock.advance(FRAME_TIME)
+        game.update(FRAME_TIME)
+
+    def settle(self, seconds=3):
+        """
+        Let the scheduled label deletions run and empty the board, so snapshots
+        taken after settling can be compared, the blocks in play are not growth
+        """
+        for _ in range(int(seconds / FRAME_TIME)):
+            self.frame()
+        self.game.reset()
+
+    def level_up(self):
+        if self.game.level == self.game.MAX_LEVEL:
+            self.game.reset()
+        self.game.level_up()
+
+    def toggle_pause(self):
+        self.game.pause()
+
+    def reset(self):
+        self.game.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _subsystems(runner: SoakRunner) -> typing.Dict[str, typing.Tuple[typing.Optional[typing.Callable], int]]:
+    """Every subsystem is an action and how many frames pass between two actions"""
+    return {
+        'blocks': (None, 0),
+        'level_text': (runner.level_up, 60),
+        'pause_text': (runner.toggle_pause, 30),
+        'reset': (runner.reset, 120),
+    }
+
+
+def _run_frames(runner: SoakRunner, action, every, frames, report: SubsystemReport = None):
+    for frame in range(frames):
+        if report is not None:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        if action is not None and frame % every == 0:
+            action()
+        runner.frame()
+        if report is not None:
+            report.allocated_bytes += tracemalloc.get_traced_memory()[1] - before
+
+
+def _growth(snapshot, previous) -> typing.List[tracemalloc.StatisticDiff]:
+    # the snapshots themselves are not part of the game
+    return [stat for stat in snapshot.compare_to(previous, 'lineno')
+            if stat.traceback[0].filename != tracemalloc.__file__]
+
+
+def soak_subsystem(name, hours, warm_up_frames=3600, seed=None) -> SubsystemReport:
+    report = SubsystemReport(name, frames=int(hours * 3600 / FRAME_TIME))
+    with SoakRunner(seed=seed) as runner:
+        action, every = _subsystems(runner)[name]
+        # let caches, fonts and the clock reach their steady state first
+        _run_frames(runner, action, every, warm_up_frames)
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        try:
+            runner.settle()
+            gc.collect()
+            collections = sum(stats['collections'] for stats in gc.get_stats())
+            objects = [len(gc.get_objects())]
+            snapshots = [tracemalloc.take_snapshot()]
+            # buffers and caches reach their high-water mark in the first segment, the rate
+            # of growth is taken from all the segments after it, so a leak that grows in
+            # only some of them still counts
+            segment = report.frames // SEGMENTS
+            for frames in [segment] * (SEGMENTS - 1) + [report.frames - segment * (SEGMENTS - 1)]:
+                _run_frames(runner, action, every, frames, report)
+                runner.settle()
+                gc.collect()
+                objects.append(len(gc.get_objects()))
+                snapshots.append(tracemalloc.take_snapshot())
+            report.collections = sum(stats['collections'] for stats in gc.get_stats()) - collections
+        finally:
+            if not tracing:
+                tracemalloc.stop()
+    report.retained_bytes = sum(stat.size_diff for stat in _growth(snapshots[-1], snapshots[0]))
+    steady_growth = _growth(snapshots[-1], snapshots[1])
+    report.steady_frames = report.frames - segment
+    report.steady_growth_bytes = sum(stat.size_diff for stat in steady_growth)
+    report.steady_growth_objects = objects[-1] - objects[1]
+    report.top_growth = [str(stat) for stat in sorted(steady_growth, key=lambda stat: -stat.size_diff)[:5]]
+    _logger.info(str(report))
+    return report
+
+
+def soak(hours=1.0, subsystems=None, max_growth_per_hour=MAX_GROWTH_PER_HOUR, seed=None) -> SoakReport:
+    """Soak every subsystem (or the given ones) for the given simulated hours"""
+    report = SoakReport(max_growth_per_hour=max_growth_per_hour)
+    for name in subsystems or ('blocks', 'level_text', 'pause_text', 'reset'):
+        report.subsystems.append(soak_subsystem(name, hours, seed=seed))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hours', type=float, default=1.0, help="simulated hours per subsystem")
+    parser.add_argument('--subsystem', action='append', dest='subsystems',
+                        choices=('blocks', 'level_text', 'pause_text', 'reset'))
+    parser.add_argument('--max-growth', type=float, default=MAX_GROWTH_PER_HOUR,
+                        help="retained bytes per simulated hour allowed")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    report = soak(args.hours, args.subsystems, args.max_growth, args.seed)
+    print(report)
+    return 1 if report.failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,6 +11,11 @@ requirements = [
         'pyglet<2',
         ]
 
+extra_requirements = {
+    'features': ['numpy'],
+    'env': ['numpy'],
+}
+
 setup_requirements = [ ]
 
 test_requirements = [
@@ -31,6 +36,7 @@ setup(
     ],
     description="Block Puzzle game made using Pyglet",
     install_requires=requirements,
+    extras_require=extra_requirements,
     license="MIT license",
     long_description=readme,
     include_package_data=True,
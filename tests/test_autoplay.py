@@ -0,0 +1,155 @@
+import threading
+import time
+
+import pytest
+
+from pyglet_block_puzzle.autoplay import DecisionWorker, SearchDecider, placement_inputs
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.placement import Placement, apply_placement, get_placements
+from pyglet_block_puzzle.game import Game
+from pyglet_block_puzzle.shape import SHAPES, ShapeHelper
+
+
+class SlowDecider:
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+        self.cancelled = 0
+
+    def __call__(self, board, preview, cancelled):
+        self.calls += 1
+        deadline = time.time() + 5
+        while not self.release.wait(0.01) and time.time() < deadline:
+            if cancelled():
+                self.cancelled += 1
+                return None
+        return Placement(1, -2)
+
+
+@pytest.fixture()
+def game():
+    return Game(100, 200, 10, None, None)
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def _wait_for_decision(game: Game, timeout=5):
+    _wait_for(lambda: not game.autoplayer.is_thinking(), timeout)
+
+
+def test_placement_inputs():
+    assert placement_inputs(Placement(2, -1)) == ['rotate', 'rotate', 'move_left', 'full_drop']
+    assert placement_inputs(Placement(0, 2)) == ['move_right', 'move_right', 'full_drop']
+
+
+class ScriptedPlayer:
+    """Plays the inputs of one placement"""
+    preview = 0
+
+    def __init__(self, placement):
+        self.placement = placement
+
+    def request(self, state, preview):
+        pass
+
+    def poll(self):
+        placement, self.placement = self.placement, None
+        return placement_inputs(placement) if placement else None
+
+    def cancel(self):
+        pass
+
+
+class OneShape(ShapeHelper):
+    def __init__(self, shape):
+        super().__init__()
+        self.shape = shape
+
+    def _draw_shape(self):
+        return self.shape
+
+
+@pytest.mark.parametrize('shape', SHAPES, ids=lambda shape: shape.__name__)
+def test_autoplay_lands_where_placement_does(game: Game, shape):
+    game.piece_maker = OneShape(shape)
+    game.reset()
+    for placement in get_placements(game.board):
+        expected = Board(game.board.width, game.board.height, print_board=False)
+        expected.spawn_piece(shape)
+        apply_placement(expected, placement)
+        game.reset()
+        game.set_autoplayer(ScriptedPlayer(placement))
+        while game.board.is_piece_active():
+            game.update(0)
+        assert game.board.get_blocks() == expected.get_blocks(), placement
+
+
+def test_autoplay_does_not_block(game: Game):
+    decider = SlowDecider()
+    with DecisionWorker(decider) as worker:
+        game.set_autoplayer(worker)
+        blocks = dict(game.board.get_blocks())
+        start = time.perf_counter()
+        for _ in range(10):
+            game.update(0)
+        assert time.perf_counter() - start < 0.5
+        assert game.board.get_blocks() == blocks
+        decider.release.set()
+        _wait_for_decision(game)
+        # a rotation blocked at the spawn plays drops first
+        for _ in range(10):
+            game.update(0)
+            if not game.board.is_piece_active():
+                break
+        assert not game.board.is_piece_active()
+        game.update(0)
+        # the next piece asked for a new decision
+        _wait_for_decision(game)
+        assert decider.calls == 2
+
+
+def test_autoplay_cancelled_on_pause(game: Game):
+    decider = SlowDecider()
+    with DecisionWorker(decider) as worker:
+        game.set_autoplayer(worker)
+        game.pause()
+        assert worker.poll() is None
+        decider.release.set()
+        game.pause()
+        _wait_for_decision(game)
+        game.reset()
+        assert decider.calls >= 2
+        for _ in range(10):
+            game.update(0)
+        game.set_autoplayer(None)
+
+
+def test_cancel_frees_worker(game: Game):
+    decider = SlowDecider()
+    with DecisionWorker(decider) as worker:
+        worker.request(game.get_state())
+        _wait_for(lambda: decider.calls == 1)
+        worker.cancel()
+        _wait_for(lambda: decider.cancelled == 1)
+        assert decider.cancelled == 1
+        # the next request does not wait behind the cancelled decision
+        decider.release.set()
+        start = time.perf_counter()
+        worker.request(game.get_state())
+        _wait_for(lambda: not worker.is_thinking())
+        assert time.perf_counter() - start < 0.5
+        assert worker.poll() == placement_inputs(Placement(1, -2))
+
+
+def test_autoplay_search_in_process(game: Game):
+    with DecisionWorker(SearchDecider(depth=1), use_process=True, preview=0) as worker:
+        game.set_autoplayer(worker)
+        # a spawned process imports the game before it can decide
+        _wait_for_decision(game, timeout=30)
+        for _ in range(12):
+            game.update(0)
+        assert len(game.board.get_blocks()) == 8
@@ -1,6 +1,6 @@
 import pytest
 
-from pyglet_block_puzzle.board import Board, BoardBlock, BoardPiece
+from pyglet_block_puzzle.board import Board, BoardBlock, BoardPiece, BoardEvent
 from pyglet_block_puzzle.color import Color
 from pyglet_block_puzzle.shape import Straight, Ti, Shape
 
@@ -231,3 +231,37 @@ def test_drop_after_row_completed_3(board, line_shape):
     # check that pieces above the cleared line has dropped
     assert (board.height - 1) in map(lambda block: block[1], board.get_blocks())
     assert (board.height - 2) in map(lambda block: block[1], board.get_blocks())
+
+
+def test_board_events(board, line_shape):
+    events = []
+    board.subscribe(lambda event, data: events.append((event, data)))
+    board.spawn_position = BoardBlock(0, 0)
+
+    board.spawn_piece(Straight)
+    assert [event for event, _ in events] == [BoardEvent.CELLS_CHANGED, BoardEvent.PIECE_SPAWNED]
+    assert events[0][1] == [(x, 0) for x in range(4)]
+    events.clear()
+    board.drop()
+    assert events == [(BoardEvent.CELLS_CHANGED, [(x, 0) for x in range(4)] + [(x, 1) for x in range(4)])]
+    events.clear()
+    board.full_drop()
+    assert events[-1][0] == BoardEvent.PIECE_LOCKED
+
+    board.spawn_piece(line_shape)
+    board.full_drop()
+    board.spawn_piece(Straight)
+    board.full_drop()
+    events.clear()
+    assert board.clear_completed_rows() == 1
+    assert events == [(BoardEvent.ROWS_CLEARED, [BOARD_SIZE - 2]),
+                      (BoardEvent.ROWS_SHIFTED, [(BOARD_SIZE - 3, BOARD_SIZE - 2)])]
+
+
+def test_board_get_blocks_cached(board):
+    board.spawn_piece(Straight)
+    blocks = board.get_blocks()
+    assert board.get_blocks() is blocks
+    board.drop()
+    assert board.get_blocks() is not blocks
+    assert board.get_blocks() != blocks
@@ -0,0 +1,93 @@
+import time
+
+import pytest
+
+from pyglet_block_puzzle import rules
+from pyglet_block_puzzle.clock import VirtualClock
+from pyglet_block_puzzle.game import Game
+from pyglet_block_puzzle.shape import ShapeHelper, Straight
+
+FRAME_TIME = 1 / 120.0
+
+
+def test_virtual_clock():
+    clock = VirtualClock()
+    calls = []
+    clock.schedule_interval(lambda dt: calls.append(('interval', round(clock.time(), 6))), 0.3)
+    clock.schedule_once(lambda dt: calls.append(('once', round(clock.time(), 6))), 0.5)
+    assert clock.advance(1) == 1
+    assert calls == [('interval', 0.3), ('once', 0.5), ('interval', 0.6), ('interval', 0.9)]
+
+
+def test_game_gravity():
+    clock = VirtualClock()
+    game = Game(100, 200, 10, None, None, clock=clock)
+    blocks = game.board.get_blocks()
+    clock.advance(game.gravity / 2)
+    assert game.board.get_blocks() == blocks
+    clock.advance(game.gravity / 2)
+    assert {(x, y - 1) for x, y in game.board.get_blocks()} == set(blocks)
+
+
+def test_virtual_clock_reads_due_times():
+    # advance reads the private heap of pyglet's Clock, it must agree with the public sleep time
+    clock = VirtualClock()
+    clock.schedule_interval(lambda dt: None, 0.3)
+    clock.schedule_once(lambda dt: None, 0.2)
+    items = clock._schedule_interval_items
+    assert min(item.next_ts for item in items) == items[0].next_ts
+    assert items[0].next_ts == pytest.approx(clock.time() + clock.get_sleep_time(True))
+
+
+def test_virtual_clock_runs_callbacks_scheduled_on_the_way():
+    clock = VirtualClock()
+    calls = []
+
+    def wake(dt):
+        calls.append(('wake', round(clock.time(), 6)))
+        clock.schedule_once(lambda dt: calls.append(('update', round(clock.time(), 6))), 0)
+
+    def unscheduled(dt):
+        calls.append(('unscheduled', round(clock.time(), 6)))
+
+    clock.schedule_once(wake, 0.25)
+    clock.schedule_once(unscheduled, 0.5)
+    clock.unschedule(unscheduled)
+    clock.advance(1)
+    assert calls == [('wake', 0.25), ('update', 0.25)]
+    assert clock.get_sleep_time(True) is None
+
+
+class StraightsOnly(ShapeHelper):
+    def _draw_shape(self):
+        return Straight
+
+
+def _play(step):
+    """Every straight falls to the bottom of a 4 wide board and clears a line"""
+    clock = VirtualClock()
+    game = Game(40, 200, 10, None, None, clock=clock)
+    game.piece_maker = StraightsOnly()
+    game.reset()
+    while not game.game_over and game.level < rules.MAX_LEVEL:
+        clock.advance(step(game))
+        game.update(0)
+    return game, clock.time()
+
+
+def test_game_reaches_max_level():
+    start = time.perf_counter()
+    game, played = _play(lambda game: game.gravity)
+    assert not game.game_over
+    assert game.level == rules.MAX_LEVEL
+    assert game.gravity == pytest.approx(rules.gravity(rules.MAX_LEVEL))
+    # ten minutes of play in a fraction of a second
+    assert played > 600
+    assert time.perf_counter() - start < 5
+
+
+def test_game_replays_in_any_steps():
+    game, played = _play(lambda game: game.gravity)
+    frames_game, frames_played = _play(lambda game: FRAME_TIME)
+    assert frames_game.score == game.score
+    assert frames_played == pytest.approx(played, abs=1)
@@ -0,0 +1,54 @@
+import pytest
+
+from pyglet_block_puzzle.simulation import HeadlessGame
+
+np = pytest.importorskip('numpy')
+env_module = pytest.importorskip('pyglet_block_puzzle.env')
+
+WIDTH = 10
+HEIGHT = 20
+
+
+def action_of(placement):
+    return placement.rotations * (2 * WIDTH - 1) + placement.shift + WIDTH - 1
+
+
+def test_env_same_as_headless_game():
+    env = env_module.BlockPuzzleEnv(WIDTH, HEIGHT, seed=7)
+    game = HeadlessGame(WIDTH, HEIGHT, seed=7)
+    observation = env.reset(7)
+    done = False
+    while not done:
+        placements = game.get_placements()
+        assert all(env.action_mask[action_of(placement)] for placement in placements)
+        placement = placements[len(placements) // 2]
+        reward = game.step(placement)
+        assert env.step(action_of(placement))[1:3] == (reward, game.is_game_over())
+        done = game.is_game_over()
+        assert env.board.get_blocks() == game.board.get_blocks()
+    assert env.score == game.score
+    assert observation['board'].any()
+
+
+def test_env_unreachable_action():
+    env = env_module.BlockPuzzleEnv(WIDTH, HEIGHT, seed=1)
+    # shifting the whole width is never possible
+    assert not env.action_mask[0]
+    _, reward, done, _ = env.step(0)
+    assert reward > 0 and not done
+
+
+def test_vector_env():
+    vector = env_module.VectorBlockPuzzleEnv(4, WIDTH, HEIGHT, seed=3)
+    observation = vector.reset(3)
+    boards = observation['board']
+    actions = np.full(4, WIDTH - 1)
+    finished = 0
+    for _ in range(200):
+        observation, rewards, dones = vector.step(actions)
+        assert observation['board'] is boards
+        finished += dones.sum()
+    # dropping everything in the middle ends games fast, they are reset automatically
+    assert finished > 0
+    assert (vector.scores > 0).any()
+    assert not boards[:, 0].all()
@@ -0,0 +1,72 @@
+import pytest
+
+from pyglet_block_puzzle.board import Board, BoardBlock
+from pyglet_block_puzzle.shape import Straight, Ti
+
+np = pytest.importorskip('numpy')
+features = pytest.importorskip('pyglet_block_puzzle.board.features')
+
+WIDTH = 4
+HEIGHT = 4
+
+
+@pytest.fixture()
+def board():
+    return Board(WIDTH, HEIGHT, print_board=False)
+
+
+def test_empty_board(board):
+    assert features.evaluate_board(board) == {
+        'aggregate_height': 0,
+        'holes': 0,
+        'bumpiness': 0,
+        'well_depth': 0,
+        'row_transitions': 2 * HEIGHT,
+        'column_transitions': WIDTH,
+        'completed_lines': 0,
+    }
+
+
+def test_evaluate():
+    """
+    |    |
+    |x   |
+    | x x|
+    |xxxx|
+    """
+    grid = np.array([[0, 0, 0, 0],
+                     [1, 0, 0, 0],
+                     [0, 1, 0, 1],
+                     [1, 1, 1, 1]], dtype=bool)
+    assert features.evaluate(grid).tolist() == [8, 1, 3, 1, 8, 6, 1]
+    batch = features.evaluate(np.stack([grid, np.zeros_like(grid)]))
+    assert batch.shape == (2, len(features.FEATURES))
+    assert batch[0].tolist() == [8, 1, 3, 1, 8, 6, 1]
+
+
+def test_tracker(board):
+    board.spawn_position = BoardBlock(0, 0)
+    tracker = features.FeatureTracker(board)
+    board.spawn_piece(Straight)
+    piece = board.get_active_piece()
+    tracker.update((block.x, block.y) for block in piece)
+    board.drop()
+    tracker.update((block.x, block.y) for block in piece.blocks + board.get_active_piece().blocks)
+    assert tracker.features == features.evaluate_board(board)
+
+    board.full_drop()
+    board.clear_completed_rows()
+    board.spawn_piece(Ti)
+    tracker.update_rows_cleared()
+    assert tracker.features == features.evaluate_board(board)
+
+
+def test_tracker_subscribed(board):
+    tracker = features.FeatureTracker(board)
+    board.subscribe(tracker.on_board_event)
+    board.spawn_position = BoardBlock(0, 0)
+    for _ in range(HEIGHT):
+        board.spawn_piece(Straight)
+        board.full_drop()
+        board.clear_completed_rows()
+        assert tracker.features == features.evaluate_board(board)
@@ -0,0 +1,19 @@
+import pytest
+
+from pyglet_block_puzzle.frame_bench import PHASES, SCENARIOS, bench_scenario, percentile
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert [percentile(values, p) for p in (50, 95, 99, 100)] == [50, 95, 99, 100]
+    assert percentile([], 50) == 0
+
+
+@pytest.mark.parametrize('scenario', list(SCENARIOS))
+def test_bench_scenario(scenario):
+    report = bench_scenario(scenario, frames=300)
+    assert report.frames == len(report.allocated_bytes) == 300
+    assert all(len(report.cpu_times[phase]) == 300 for phase in PHASES)
+    assert 0 < report.cpu(50) <= report.cpu(99)
+    assert report.allocated(99) > 0
+    assert scenario in str(report)
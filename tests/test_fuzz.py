@@ -0,0 +1,25 @@
+from pyglet_block_puzzle.board.fast_board import FastBoard
+from pyglet_block_puzzle.fuzz import fuzz
+
+
+class NoRowsFastBoard(FastBoard):
+    def clear_completed_rows(self) -> int:
+        return 0
+
+
+def test_fuzz_fast_board():
+    report = fuzz({'FastBoard': FastBoard}, sequences=20, length=300, seed=1)
+    assert not report.mismatches
+    assert report.steps > 0
+    assert set(report.throughput) == {'Board', 'FastBoard'}
+
+
+def test_fuzz_shrink():
+    report = fuzz({'broken': NoRowsFastBoard}, sequences=20, length=1000, seed=2, width=4, height=8)
+    assert report.mismatches
+    mismatch = report.mismatches[0]
+    assert mismatch.engine == 'broken'
+    assert mismatch.check in ('cleared', 'get_blocks')
+    # filling a 4 wide row needs very few inputs
+    assert len(mismatch.inputs) <= 10
+    assert 'broken' in str(report)
@@ -0,0 +1,89 @@
+import pytest
+from pyglet.window import key
+
+from pyglet_block_puzzle.clock import VirtualClock
+from pyglet_block_puzzle.main import BLOCK_SIZE, HEIGHT, WIDTH, BlockPuzzle
+
+FRAME_TIME = 1 / 120.0
+
+
+@pytest.fixture()
+def clock():
+    return VirtualClock()
+
+
+@pytest.fixture()
+def window(clock):
+    window = BlockPuzzle(WIDTH, HEIGHT, BLOCK_SIZE, clock=clock, idle_aware=True, visible=False)
+    clock.advance(FRAME_TIME)
+    yield window
+    clock.unschedule(window.update)
+    clock.unschedule(window.game.fall)
+    clock.unschedule(window.game.move)
+    window.close()
+
+
+def _dispatch(window: BlockPuzzle, *event):
+    window.dispatch_event(*event)
+    window.dispatch_events()
+
+
+def _draws(window: BlockPuzzle, monkeypatch) -> list:
+    draws = []
+    monkeypatch.setattr(window, 'clear', lambda: draws.append(window.clock.time()))
+    return draws
+
+
+def test_idle_window_sleeps_until_gravity(window: BlockPuzzle, clock: VirtualClock):
+    assert clock.get_sleep_time(True) == pytest.approx(window.game.gravity - FRAME_TIME)
+    blocks = window.game.board.get_blocks()
+    window.game.dirty = False
+    clock.advance(clock.get_sleep_time(True))
+    # the drop woke the window and was redrawn
+    assert window.game.board.get_blocks() != blocks
+    assert window.game.dirty
+    assert clock.get_sleep_time(True) == pytest.approx(window.game.gravity)
+
+
+def test_idle_window_polls_held_keys(window: BlockPuzzle, clock: VirtualClock):
+    _dispatch(window, 'on_key_press', key.LEFT, 0)
+    assert clock.get_sleep_time(True) == 0
+    clock.advance(FRAME_TIME)
+    assert clock.get_sleep_time(True) <= window.game.MOVE_SPEED_IN_SECONDS
+    _dispatch(window, 'on_key_release', key.LEFT, 0)
+    clock.advance(FRAME_TIME)
+    assert clock.get_sleep_time(True) > FRAME_TIME
+
+
+@pytest.mark.parametrize('stop', ['pause', 'game_over'])
+def test_idle_window_stops_timers(window: BlockPuzzle, clock: VirtualClock, stop):
+    if stop == 'pause':
+        _dispatch(window, 'on_key_press', key.P, 0)
+    else:
+        board = window.game.board
+        for y in range(2, board.height):
+            for x in range(3, 7):
+                board.set_block(x, y, 'S')
+        _dispatch(window, 'on_key_press', key.SPACE, 0)
+    clock.advance(FRAME_TIME)
+    assert window.game.is_paused()
+    blocks = window.game.board.get_blocks()
+    # unscheduled timers leave a no-op behind until they were due
+    clock.advance(window.game.gravity)
+    assert window.game.board.get_blocks() == blocks
+    assert clock.get_sleep_time(True) is None
+    _dispatch(window, 'on_key_press', key.P if stop == 'pause' else key.R, 0)
+    clock.advance(FRAME_TIME)
+    assert not window.game.is_paused()
+    assert clock.get_sleep_time(True) == pytest.approx(window.game.gravity - FRAME_TIME, abs=FRAME_TIME)
+
+
+def test_idle_window_skips_unchanged_frames(window: BlockPuzzle, clock: VirtualClock, monkeypatch):
+    draws = _draws(window, monkeypatch)
+    _dispatch(window, 'on_draw')
+    _dispatch(window, 'on_draw')
+    assert len(draws) == 1
+    clock.advance(window.game.gravity)
+    _dispatch(window, 'on_draw')
+    _dispatch(window, 'on_draw')
+    assert len(draws) == 2
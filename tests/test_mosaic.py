@@ -0,0 +1,68 @@
+import pytest
+
+from pyglet_block_puzzle.mosaic import EMPTY_COLOR, Mosaic
+from pyglet_block_puzzle.simulation import HeadlessGame
+
+
+@pytest.fixture()
+def mosaic():
+    mosaic = Mosaic(columns=2, cell_size=2, unfocused_interval=0.25)
+    for seed in range(6):
+        mosaic.add(HeadlessGame(seed=seed))
+    # two of the three rows of tiles fit
+    mosaic.set_view(mosaic.columns * mosaic.tile_width, 2 * mosaic.tile_height)
+    yield mosaic
+    mosaic.close()
+
+
+def _cell_color(mosaic: Mosaic, index, x, y):
+    offset = (y * mosaic.board_width + x) * 12
+    return tuple(mosaic.tiles[index].vertex_list.colors[offset:offset + 3])
+
+
+def test_mosaic_refreshes_changed_tiles(mosaic: Mosaic):
+    assert mosaic.update(0.25) == 4
+    assert mosaic.update(0.25) == 0
+    game = mosaic.tiles[1].game
+    game.step(game.get_placements()[0])
+    assert mosaic.update(0.25) == 1
+    for (x, y), shape_id in game.board.get_blocks().items():
+        assert _cell_color(mosaic, 1, x, y) == game.piece_maker.get_shape_from_id(shape_id).color.value
+    assert _cell_color(mosaic, 0, 0, mosaic.board_height - 1) == EMPTY_COLOR
+
+
+def test_mosaic_focused_tile_refreshes_first(mosaic: Mosaic):
+    mosaic.update(0.25)
+    mosaic.focused = 0
+    for game in (mosaic.tiles[0].game, mosaic.tiles[1].game):
+        game.step(game.get_placements()[0])
+    assert mosaic.update(0.1) == 1
+    assert mosaic.tiles[1].is_dirty()
+    assert mosaic.update(0.15) == 1
+    mosaic.minimized = True
+    game = mosaic.tiles[0].game
+    game.step(game.get_placements()[0])
+    assert mosaic.update(0.25) == 0
+
+
+def test_mosaic_hides_tiles_out_of_view(mosaic: Mosaic):
+    assert [tile.vertex_list is not None for tile in mosaic.tiles] == [True] * 4 + [False] * 2
+    game = mosaic.tiles[5].game
+    game.step(game.get_placements()[0])
+    mosaic.scroll_to(mosaic.tile_height)
+    assert [tile.vertex_list is not None for tile in mosaic.tiles] == [False] * 2 + [True] * 4
+    assert mosaic.tile_at(0, mosaic.view_height - 1) == 2
+    mosaic.update(0.25)
+    for (x, y), shape_id in game.board.get_blocks().items():
+        assert _cell_color(mosaic, 5, x, y) == game.piece_maker.get_shape_from_id(shape_id).color.value
+
+
+def test_mosaic_follows_reset(mosaic: Mosaic):
+    game = mosaic.tiles[0].game
+    game.step(game.get_placements()[0])
+    mosaic.update(0.25)
+    old_board = game.board
+    game.reset()
+    assert mosaic.update(0.25) == 1
+    assert not old_board._subscribers
+    mosaic.batch.draw()
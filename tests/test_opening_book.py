@@ -0,0 +1,65 @@
+import pickle
+
+import pytest
+
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.placement import apply_placement
+from pyglet_block_puzzle.opening_book import OpeningBook, BookDecider, best_placements, build_book, \
+    column_heights, surface_profile
+from pyglet_block_puzzle.shape import SHAPES, Straight, Square
+
+
+@pytest.fixture(scope='module')
+def book(tmp_path_factory):
+    path = tmp_path_factory.mktemp('book') / 'book.bin'
+    assert build_book(path, width=4, height=8, clamp=1) == 27 * len(SHAPES)
+    with OpeningBook(path) as book:
+        yield book
+
+
+@pytest.fixture()
+def board():
+    board = Board(4, 8, print_board=False)
+    for x, height in enumerate((1, 3, 0, 1)):
+        for y in range(8 - height, 8):
+            board.set_block(x, y, 'S')
+    return board
+
+
+def test_surface_profile(board: Board):
+    board.spawn_piece(Square)
+    assert column_heights(board) == [1, 3, 0, 1]
+    assert surface_profile(column_heights(board), 1) == (1, -1, 1)
+
+
+def test_lookup(book: OpeningBook, board: Board):
+    for shape in SHAPES:
+        assert book.lookup_profile((1, -1, 1), shape) == best_placements((1, -1, 1), shape, 8)
+    board.spawn_piece(Straight)
+    placements = book.lookup(board)
+    assert placements
+    apply_placement(board, placements[0])
+    board.drop()
+    assert board.clear_completed_rows() == 1
+
+
+def test_lookup_miss(book: OpeningBook, board: Board):
+    board.spawn_piece(Straight)
+    board.drop()
+    assert book.lookup(board) == []
+    assert book.lookup(Board(5, 8, print_board=False)) == []
+
+
+def test_book_decider(book: OpeningBook, board: Board):
+    decider = pickle.loads(pickle.dumps(BookDecider(book)))
+    board.spawn_piece(Straight)
+    assert decider(board, []) == book.lookup(board)[0]
+    board.drop()
+    assert decider(board, []) is not None
+    assert (decider.hits, decider.misses) == (1, 1)
+
+
+def test_build_book_in_workers(book: OpeningBook, tmp_path):
+    path = tmp_path / 'book.bin'
+    assert build_book(path, width=4, height=8, clamp=1, workers=2, chunk_size=4) == 27 * len(SHAPES)
+    assert path.read_bytes() == open(book.path, 'rb').read()
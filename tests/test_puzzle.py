@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.placement import apply_placement
+from pyglet_block_puzzle.puzzle import PerfectClearSolver, Puzzle, SolveResult
+from pyglet_block_puzzle.shape import SHAPES
+
+_SHAPES = {shape.id: shape for shape in SHAPES}
+
+
+def _puzzle(pieces, width=10, height=20, rows=()):
+    board = Board(width, height, print_board=False)
+    for y, row in enumerate(reversed(rows)):
+        for x, cell in enumerate(row):
+            if cell != '.':
+                board.set_block(x, height - 1 - y, cell)
+    return Puzzle(board, [_SHAPES[shape_id] for shape_id in pieces])
+
+
+def _play(puzzle: Puzzle, placements):
+    assert len(placements) == len(puzzle.pieces)
+    for shape, placement in zip(puzzle.pieces, placements):
+        puzzle.board.spawn_piece(shape)
+        apply_placement(puzzle.board, placement)
+        puzzle.board.clear_completed_rows()
+    return puzzle.board.get_blocks()
+
+
+_WELL = ('IIIIII....', 'IIIIII....', 'IIIIII....')
+
+
+@pytest.mark.parametrize('pieces, width, rows', [
+    ('IIII', 4, ()),
+    ('LSR', 10, _WELL),
+    # a cell has to be covered on the way
+    ('LSTIOZRRIO', 10, ()),
+])
+def test_solve(pieces, width, rows):
+    puzzle = _puzzle(pieces, width, rows=rows)
+    result = PerfectClearSolver().solve(puzzle)
+    assert result.complete
+    assert not _play(puzzle, result.placements)
+
+
+# 7-bag sequences and three more pieces, solved on an empty board
+@pytest.mark.parametrize('pieces', ['LTSIRZOZOT', 'SZOTILRLST', 'TOSLZIRITR'])
+def test_solve_in_time(pieces):
+    puzzle = _puzzle(pieces)
+    result = PerfectClearSolver().solve(puzzle, timeout=1)
+    assert result.complete
+    assert not _play(puzzle, result.placements)
+
+
+def test_no_solution():
+    solver = PerfectClearSolver()
+    # the cells do not make full rows
+    assert solver.solve(_puzzle('III')) == SolveResult(None, True, 0)
+    assert solver.solve(_puzzle('SSS', rows=_WELL)).placements is None
+    result = solver.solve(_puzzle('TOISLZSOZO'))
+    assert result.complete and result.placements is None
+    result = solver.solve(_puzzle('RTIZOLSITZ'), timeout=1)
+    assert result.complete and result.placements is None
+    with pytest.raises(ValueError):
+        solver.solve(_puzzle('T', rows=('IIIIII....', '..........')))
+    with pytest.raises(ValueError):
+        solver.solve(_puzzle('I' * 45))
+
+
+def test_solve_timeout():
+    # eight rows have too many tilings to find in time, searching without them takes longer than the timeout
+    start = time.perf_counter()
+    result = PerfectClearSolver().solve(_puzzle('TOISRLZSOZ' * 2), timeout=0.5)
+    assert time.perf_counter() - start < 1
+    assert not result.complete
+    assert result.placements is None
+    assert result.searched > 0
+
+
+def test_solve_split():
+    puzzle = _puzzle('LSTIOZRRIO')
+    with PerfectClearSolver(workers=1) as solver:
+        result = solver.solve(puzzle)
+    assert result.complete
+    assert not _play(puzzle, result.placements)
@@ -0,0 +1,87 @@
+import pytest
+
+from pyglet_block_puzzle.clock import VirtualClock
+from pyglet_block_puzzle.game import Game
+from pyglet_block_puzzle.rewind import RewindBuffer
+from pyglet_block_puzzle.search import PlacementSearch
+from pyglet_block_puzzle.simulation import HeadlessGame
+
+
+def _settled(state):
+    piece = state.board.get_active_piece()
+    own_cells = {(block.x, block.y) for block in piece} if piece else set()
+    blocks = {cell: shape_id for cell, shape_id in state.board.get_blocks().items() if cell not in own_cells}
+    return blocks, state.score, state.level, state.cleared_lines, state.bag
+
+
+@pytest.fixture()
+def played():
+    game = HeadlessGame(seed=2)
+    buffer = RewindBuffer(game.width, game.height, keyframe_interval=16)
+    states = [_settled(game.get_state())]
+    buffer.push(game.get_state())
+    with PlacementSearch(depth=1, workers=0) as search:
+        for _ in range(100):
+            game.step(search.search(game.board).placement)
+            buffer.push(game.get_state())
+            states.append(_settled(game.get_state()))
+    return buffer, states
+
+
+def test_rewind_states(played):
+    buffer, states = played
+    assert any(states[i][0] != states[i + 1][0] for i in range(100))
+    for pieces_back in (0, 1, 7, 16, 33, 100):
+        assert _settled(buffer.state(pieces_back)) == states[-1 - pieces_back]
+
+
+def test_rewind_drops_snapshots(played):
+    buffer, states = played
+    assert _settled(buffer.rewind(10)) == states[-11]
+    assert len(buffer) == 91
+    assert _settled(buffer.state(0)) == states[-11]
+    assert _settled(buffer.rewind(5)) == states[-16]
+    with pytest.raises(IndexError):
+        buffer.rewind(len(buffer))
+
+
+def test_rewind_capacity(played):
+    buffer, _ = played
+    small = RewindBuffer(buffer.width, buffer.height, capacity=10)
+    for pieces_back in range(100, -1, -1):
+        small.push(buffer.state(pieces_back))
+    assert len(small) == 10
+    assert small.state(9).board.get_blocks() == buffer.state(9).board.get_blocks()
+    assert small.nbytes < 10 * buffer.width * buffer.height
+
+
+def test_game_rewind():
+    game = Game(100, 200, 10, None, None, rewind_capacity=100)
+    assert not game.rewind()
+    for _ in range(3):
+        game.board.full_drop()
+        game.update(0)
+    assert len(game.rewind_buffer) == 4
+    assert game.rewind(2)
+    assert len(game.board.get_blocks()) == 8
+    assert game.board.is_piece_active()
+    game.reset()
+    assert len(game.rewind_buffer) == 1
+
+
+def test_game_rewind_while_paused():
+    clock = VirtualClock()
+    game = Game(100, 200, 10, None, None, rewind_capacity=100, clock=clock)
+    for _ in range(2):
+        game.board.full_drop()
+        game.update(0)
+    game.pause()
+    assert game.rewind()
+    blocks = game.board.get_blocks()
+    clock.advance(game.gravity * 3)
+    assert game.board.get_blocks() == blocks
+    piece = {(block.x, block.y) for block in game.board.get_active_piece()}
+    game.pause()
+    # gravity runs at its own speed after the pause, not twice over
+    clock.advance(game.gravity)
+    assert {(block.x, block.y - 1) for block in game.board.get_active_piece()} == piece
@@ -0,0 +1,99 @@
+import random
+import time
+
+import pytest
+
+from pyglet_block_puzzle.board.board import Board
+from pyglet_block_puzzle.board.fast_board import FastBoard
+from pyglet_block_puzzle.board.placement import apply_placement
+from pyglet_block_puzzle.search import GAME_OVER_SCORE, PlacementSearch, _search, children, evaluate, WEIGHTS
+from pyglet_block_puzzle.shape import ShapeHelper, Straight
+from pyglet_block_puzzle.simulation import HeadlessGame
+
+
+@pytest.fixture()
+def game():
+    game = HeadlessGame(seed=5)
+    with PlacementSearch(depth=1, workers=0) as search:
+        for _ in range(8):
+            game.step(search.search(game.board).placement)
+    return game
+
+
+def test_evaluate():
+    board = FastBoard(4, 4)
+    board.load(bytes([0, 0, 0, 0,
+                      0, 1, 0, 0,
+                      0, 0, 0, 0,
+                      1, 1, 0, 0]))
+    # heights 1, 3, 0, 0 with one hole under the second column
+    _, height, holes, bumpiness = WEIGHTS
+    assert evaluate(board) == pytest.approx(4 * height + holes + 5 * bumpiness)
+
+
+def test_search_topped_out():
+    board = FastBoard(4, 6)
+    # every row but one cell in the last column, the spawn is blocked
+    board.load(bytes([1, 1, 1, 0] * 6))
+    assert not list(children(board.copy(), Straight))
+    assert _search(board, [Straight], evaluate, None) == GAME_OVER_SCORE
+
+
+def test_search_clears_line():
+    board = Board(4, 6, print_board=False)
+    for x in range(3):
+        board.set_block(x, 5, 'S')
+    board.spawn_piece(Straight)
+    result = PlacementSearch(depth=1, workers=0).search(board)
+    assert result.complete
+    apply_placement(board, result.placement)
+    assert board.clear_completed_rows() == 1
+
+
+def test_search_pool_matches_serial(game: HeadlessGame):
+    preview = game.piece_maker.preview(1)
+    serial = PlacementSearch(depth=2, workers=0).search(game.board, preview)
+    with PlacementSearch(depth=2, workers=2) as search:
+        assert search.search(game.board, preview) == serial
+        # the pool is reused for the next move
+        assert search.search(game.board, preview) == serial
+    assert serial.complete and serial.searched > 0
+
+
+def test_search_deadline(game: HeadlessGame):
+    result = PlacementSearch(depth=3, workers=0).search(game.board, game.piece_maker.preview(2), timeout=0)
+    assert not result.complete
+    assert result.placement in game.get_placements()
+
+
+def test_search_cancelled(game: HeadlessGame):
+    preview = game.piece_maker.preview(2)
+    result = PlacementSearch(depth=3, workers=0).search(game.board, preview, cancelled=lambda: True)
+    assert not result.complete
+    assert result.placement in game.get_placements()
+    with PlacementSearch(depth=4, workers=1) as search:
+        start = time.perf_counter()
+        result = search.search(game.board, game.piece_maker.preview(3),
+                               cancelled=lambda: time.perf_counter() > start + 0.1)
+        assert not result.complete
+        # the next move does not queue behind the cancelled subtrees
+        assert search.search(game.board, preview[:1]).complete
+        assert time.perf_counter() - start < 2
+
+
+def test_preview():
+    shapes = ShapeHelper(random.Random(1))
+    preview = shapes.preview(3)
+    assert shapes.preview(2) == preview[:2]
+    assert [shapes.get_random_shape() for _ in range(3)] == preview
+    assert ShapeHelper(random.Random(1)).preview(3) == preview
+
+
+def test_preview_keeps_bag():
+    shapes = ShapeHelper(random.Random(1))
+    bag = shapes.bag
+    preview = shapes.preview(3)
+    assert shapes.bag == bag
+    # a state loaded with the bag draws what was previewed
+    shapes.bag = bag
+    assert [shapes.get_random_shape() for _ in range(3)] == preview
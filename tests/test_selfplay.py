@@ -0,0 +1,46 @@
+import itertools
+import os
+
+import pytest
+
+from pyglet_block_puzzle import selfplay
+from pyglet_block_puzzle.selfplay import ChunkWriter, read_transitions, run_self_play, self_play
+from pyglet_block_puzzle.serialization import GameStateCodec
+
+
+def test_self_play():
+    codec = GameStateCodec(10, 20)
+    transitions = list(self_play(seed=3, games=2))
+    assert sum(transition.done for transition in transitions) == 2
+    assert transitions[-1].done
+    for transition, following in zip(transitions, transitions[1:]):
+        if not transition.done:
+            assert following.state == transition.next_state
+    state = codec.unpack(transitions[0].next_state)
+    assert state.score == transitions[0].reward
+
+
+def test_chunks(tmp_path):
+    transitions = list(itertools.islice(self_play(seed=1), 25))
+    with ChunkWriter(tmp_path, 10, 20, chunk_size=10) as writer:
+        for transition in transitions:
+            writer.write(transition)
+    assert len(list(tmp_path.iterdir())) == 3
+    assert list(read_transitions(tmp_path, block_records=4)) == transitions
+
+
+def test_run_self_play(tmp_path):
+    assert run_self_play(tmp_path, 300, workers=2, chunk_size=100, batch_records=32) == 300
+    assert sum(1 for _ in read_transitions(tmp_path)) == 300
+
+
+def _dying_worker(*args):
+    # like a worker killed for running out of memory
+    os._exit(1)
+
+
+def test_run_self_play_worker_dies(tmp_path, monkeypatch):
+    # module level, so spawned workers import it rather than the real worker
+    monkeypatch.setattr(selfplay, '_self_play_worker', _dying_worker)
+    with pytest.raises(RuntimeError, match='code 1'):
+        run_self_play(tmp_path, 300, workers=2, chunk_size=100, batch_records=32)
@@ -0,0 +1,65 @@
+import pytest
+
+from pyglet_block_puzzle.board import Board
+from pyglet_block_puzzle.serialization import GameState, GameStateCodec, StateArchive
+from pyglet_block_puzzle.shape import Straight, Ti, Square, Zed
+
+WIDTH = 10
+HEIGHT = 20
+
+
+@pytest.fixture()
+def state():
+    board = Board(WIDTH, HEIGHT, print_board=False)
+    board.spawn_piece(Straight)
+    board.full_drop()
+    board.spawn_piece(Square)
+    board.drop()
+    board.move_left()
+    board.spawn_piece(Ti)
+    board.drop()
+    board.drop()
+    board.rotate()
+    return GameState(board=board, bag={Zed, Square}, score=1234, level=3, cleared_lines=7)
+
+
+def assert_same_state(state: GameState, other: GameState):
+    assert other.board.get_blocks() == state.board.get_blocks()
+    assert other.board.get_active_piece() == state.board.get_active_piece()
+    assert other.board.is_game_over() == state.board.is_game_over()
+    assert (other.bag, other.score, other.level, other.cleared_lines) == \
+        (state.bag, state.score, state.level, state.cleared_lines)
+
+
+def test_codec(state):
+    codec = GameStateCodec(WIDTH, HEIGHT)
+    data = codec.pack(state)
+    assert len(data) == codec.record_size
+    # 3 bits for each cell
+    assert codec.record_size <= WIDTH * HEIGHT * 3 // 8 + 16
+    assert_same_state(state, codec.unpack(data))
+
+
+def test_codec_wrong_size(state):
+    with pytest.raises(ValueError):
+        GameStateCodec(WIDTH, HEIGHT + 1).pack(state)
+
+
+def test_archive(state, tmp_path):
+    path = tmp_path / 'states.bin'
+    empty = GameState(Board(WIDTH, HEIGHT, print_board=False))
+    with StateArchive(path, WIDTH, HEIGHT) as archive:
+        archive.extend([state, empty])
+        assert_same_state(empty, archive[1])
+        archive.append(state)
+        assert_same_state(state, archive[-1])
+
+    with StateArchive(path, WIDTH, HEIGHT) as archive:
+        assert len(archive) == 3
+        assert_same_state(state, archive[0])
+        assert_same_state(empty, archive[1])
+        with pytest.raises(IndexError):
+            archive.get_record(3)
+
+    with pytest.raises(ValueError):
+        StateArchive(path, WIDTH, HEIGHT + 1)
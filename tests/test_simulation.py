@@ -0,0 +1,50 @@
+import copy
+
+import pytest
+
+from pyglet_block_puzzle.board import Board
+from pyglet_block_puzzle.board.placement import Placement, apply_placement, get_placements
+from pyglet_block_puzzle.shape import Square, Straight
+from pyglet_block_puzzle.simulation import HeadlessGame
+
+
+@pytest.fixture()
+def board():
+    return Board(10, 20, print_board=False)
+
+
+def test_placements(board):
+    board.spawn_piece(Straight)
+    placements = get_placements(board)
+    # 7 horizontal and 10 vertical positions
+    assert len(placements) == 17
+    for placement in placements:
+        copied = copy.deepcopy(board)
+        apply_placement(copied, placement)
+        assert not copied.is_piece_active()
+        for block in placement.landing:
+            assert copied.get_block(block.x, block.y) == Straight.id
+
+
+def test_placements_square(board):
+    board.spawn_piece(Square)
+    assert len(get_placements(board)) == 9
+
+
+def test_apply_illegal_placement(board):
+    board.spawn_piece(Straight)
+    with pytest.raises(ValueError):
+        apply_placement(board, Placement(0, 7))
+
+
+def test_headless_game_seed():
+    def play(seed):
+        game = HeadlessGame(seed=seed)
+        rewards = []
+        while not game.is_game_over():
+            rewards.append(game.step(game.get_placements()[0]))
+        return rewards, game.score
+
+    rewards, score = play(1)
+    assert sum(rewards) == score > 0
+    assert play(1) == (rewards, score)
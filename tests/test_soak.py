@@ -0,0 +1,40 @@
+import pytest
+
+from pyglet_block_puzzle.game import Game
+from pyglet_block_puzzle.soak import MAX_GROWTH_PER_HOUR, soak, soak_subsystem
+
+
+@pytest.fixture()
+def leaky_clocks(monkeypatch):
+    # the move polling is scheduled again on every spawn without being unscheduled
+    monkeypatch.setattr(Game, '_unschedule_clocks', lambda self: self.clock.unschedule(self.fall))
+
+
+def test_soak_flat():
+    report = soak(hours=0.005, subsystems=['blocks', 'pause_text'], seed=0)
+    assert not report.failures, str(report)
+    for subsystem in report.subsystems:
+        assert subsystem.frames == 2160
+        assert subsystem.allocated_per_frame > 0
+
+
+def test_soak_detects_leak(leaky_clocks):
+    report = soak_subsystem('reset', hours=0.003, warm_up_frames=600, seed=0)
+    assert report.growth_per_hour > MAX_GROWTH_PER_HOUR
+    assert any('game.py' in line for line in report.top_growth)
+
+
+def test_soak_detects_late_leak(monkeypatch):
+    leaked = []
+    reset = Game.reset
+
+    def leaky_reset(self):
+        # only in the last segment of the run, after about 22 simulated seconds
+        if self.clock.time() > 22:
+            leaked.append(bytearray(10000))
+        reset(self)
+
+    monkeypatch.setattr(Game, 'reset', leaky_reset)
+    report = soak_subsystem('reset', hours=0.003, warm_up_frames=600, seed=0)
+    assert leaked
+    assert report.growth_per_hour > MAX_GROWTH_PER_HOUR
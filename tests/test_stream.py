@@ -0,0 +1,75 @@
+import pytest
+
+from pyglet_block_puzzle.board import Board, BoardBlock
+from pyglet_block_puzzle.board.stream import BoardStreamEncoder, BoardStreamDecoder
+from pyglet_block_puzzle.shape import Straight, Ti, Square
+
+WIDTH = 10
+HEIGHT = 20
+
+
+@pytest.fixture()
+def board():
+    return Board(WIDTH, HEIGHT, print_board=False)
+
+
+def assert_same_board(board: Board, other: Board):
+    assert other.get_blocks() == board.get_blocks()
+    assert other.get_active_piece() == board.get_active_piece()
+    assert other.is_game_over() == board.is_game_over()
+
+
+def test_keyframe(board):
+    board.spawn_piece(Straight)
+    board.full_drop()
+    board.spawn_piece(Ti)
+    board.drop()
+    board.rotate()
+    decoder = BoardStreamDecoder()
+    decoder.decode(BoardStreamEncoder(board).keyframe(score=120, level=2))
+    assert_same_board(board, decoder.board)
+    assert (decoder.score, decoder.level) == (120, 2)
+
+
+def test_delta_small(board):
+    encoder = BoardStreamEncoder(board)
+    decoder = BoardStreamDecoder()
+    decoder.decode(encoder.keyframe())
+    assert encoder.delta() == b'D'
+
+    board.spawn_piece(Ti)
+    for move in [board.drop, board.move_left, board.rotate, board.drop, board.full_drop]:
+        move()
+        data = encoder.delta()
+        assert len(data) < 20
+        assert_same_board(board, decoder.decode(data))
+
+
+def test_delta_clear_rows(board):
+    spawn_position = board.spawn_position
+    encoder = BoardStreamEncoder(board)
+    decoder = BoardStreamDecoder()
+    decoder.decode(encoder.keyframe())
+
+    for x in range(0, WIDTH - 2, 2):
+        board.spawn_position = BoardBlock(x, 0)
+        board.spawn_piece(Square)
+        board.full_drop()
+        assert_same_board(board, decoder.decode(encoder.delta()))
+    board.spawn_position = BoardBlock(WIDTH - 2, 0)
+    board.spawn_piece(Square)
+    decoder.decode(encoder.delta())
+    board.full_drop()
+    assert board.clear_completed_rows() == 2
+    board.spawn_position = spawn_position
+    board.spawn_piece(Straight)
+
+    data = encoder.delta(score=300)
+    assert len(data) < 20
+    assert_same_board(board, decoder.decode(data))
+    assert decoder.score == 300
+
+
+def test_delta_before_keyframe():
+    with pytest.raises(ValueError):
+        BoardStreamDecoder().decode(b'D')